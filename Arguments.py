@@ -10,11 +10,14 @@ from sys import argv
 
 
 # Operators to be used by the models
-# Only these operators are available. To add mode, edit m3gp.Node.calculate(self, sample)
+# Only these operators are available. To add more, edit stdgp.Evaluator (calculateOperator and calculateScalar)
 
 #OPERATORS = [("+",2),("-",2),("*",2),("/",2),("log2",1), ("max", 3)] # Example
 OPERATORS = [("+",2),("-",2),("*",2),("/",2)] # Default
 
+# Range (low, high) of the ephemeral random constants added to the terminals (None: no constants)
+ERC_RANGE = None
+
 # Initial Maximum depth
 MAX_DEPTH = 6
 
@@ -39,6 +42,12 @@ SHUFFLE = True
 # Dimensions maximum depth
 LIMIT_DEPTH=17
 
+# Maximum number of nodes of the offspring (None: no limit)
+MAX_SIZE = None
+
+# Bloat control applied before the offspring are evaluated: None, "tarpeian" or "dynamic"
+BLOAT_CONTROL = [None, "tarpeian", "dynamic"][0]
+
 # Number of runs (used by Main_M3GP_standalone.py)
 RUNS = 30
 
@@ -48,14 +57,53 @@ VERBOSE = True
 # Number of CPU Threads to be used
 THREADS = 1
 
+# Population evaluation backend: "serial", "thread" (thread pool, shares the dataset), "process" (process pool)
+# or "socket" (workers started with Main_StdGP_worker.py, connected to localhost:6000 with the printed authkey)
+# None uses "serial" with 1 thread and "process" otherwise
+BACKEND = [None, "serial", "thread", "process", "socket"][0]
+
+# Island model: number of sub-populations, each evolved in its own process (1: no islands)
+ISLANDS = 1
+
+# Generations between migrations and number of migrants sent by each island
+MIGRATION_INTERVAL = 10
+MIGRATION_SIZE = 1
+
+# Island that receives the migrants: "ring" (the next island) or "random"
+MIGRATION_TOPOLOGY = ["ring", "random"][0]
+
+# Precision used to evaluate the models: "float64" or "float32"
+DTYPE = ["float64", "float32"][0]
+
+# Number of results kept in the semantic cache, indexed by the hash of the models' outputs (0: no cache)
+SEMANTIC_CACHE = 0
+
+# Scores the models with constant outputs, found using the features' ranges, without evaluating them
+INTERVAL_ANALYSIS = False
+
 # Random state
 RANDOM_STATE = 42
 
 # Models wrapped by the StdGP models
-MODEL_NAME = ["SimpleThresholdClassifier"][0]
+# The AccuracyThresholdClassifier and F1ThresholdClassifier learn the threshold that maximizes the accuracy or F1 score
+MODEL_NAME = ["SimpleThresholdClassifier", "AccuracyThresholdClassifier", "F1ThresholdClassifier"][0]
 
 # Fitness used by the M3GP models
-FITNESS_TYPE = ["Accuracy", "MSE", "WAF", "2FOLD"][0]
+FITNESS_TYPE = ["Accuracy", "MSE", "WAF", "2FOLD", "KFOLD"][0]
+
+# Number of stratified folds used by the KFOLD fitness
+N_FOLDS = 5
+
+
+
+# Keep a binary copy of each dataset to avoid parsing the CSV in every run (used by Main_StdGP_standalone.py)
+DATASET_CACHE = True
+
+# Directory of the dataset cache (default: ".cache/" inside the datasets directory)
+DATASET_CACHE_DIR = None
+
+# How the dataset cache is invalidated: "mtime" (file modification time and size) or "hash" (file contents)
+DATASET_CACHE_VALIDATION = ["mtime", "hash"][0]
 
 
 
@@ -113,8 +161,50 @@ if "-s" in argv:
 if "-t" in argv:
 	THREADS = int(argv[argv.index("-t")+1])
 
+if "-folds" in argv:
+	N_FOLDS = int(argv[argv.index("-folds")+1])
+
+if "-erc" in argv:
+	ERC_RANGE = tuple( [float(v) for v in argv[argv.index("-erc")+1].split(",")] )
+
+if "-backend" in argv:
+	BACKEND = argv[argv.index("-backend")+1]
+
+if "-islands" in argv:
+	ISLANDS = int(argv[argv.index("-islands")+1])
+
+if "-migration" in argv:
+	MIGRATION_INTERVAL, MIGRATION_SIZE = [int(v) for v in argv[argv.index("-migration")+1].split(",")]
+
+if "-topology" in argv:
+	MIGRATION_TOPOLOGY = argv[argv.index("-topology")+1]
+
+if "-maxsize" in argv:
+	MAX_SIZE = int(argv[argv.index("-maxsize")+1])
+
+if "-bloat" in argv:
+	BLOAT_CONTROL = argv[argv.index("-bloat")+1]
+
+if "-float32" in argv:
+	DTYPE = "float32"
+
+if "-semcache" in argv:
+	SEMANTIC_CACHE = int(argv[argv.index("-semcache")+1])
+
+if "-intervals" in argv:
+	INTERVAL_ANALYSIS = True
+
 if "-rs" in argv:
 	RANDOM_STATE = int(argv[argv.index("-rs")+1])
 
+if "-nocache" in argv:
+	DATASET_CACHE = False
+
+if "-cachedir" in argv:
+	DATASET_CACHE_DIR = argv[argv.index("-cachedir")+1]
+
+if "-cachehash" in argv:
+	DATASET_CACHE_VALIDATION = "hash"
+
 
 
@@ -0,0 +1,57 @@
+import pandas
+
+from stdgp.StdGP import StdGP
+from stdgp.Distributed import SocketBackend, runWorker
+
+from sklearn.model_selection import train_test_split
+
+from sklearn.metrics import accuracy_score
+
+import multiprocessing as mp
+import secrets
+
+
+
+# 
+# By using this file, you are agreeing to this product's EULA
+#
+# This product can be obtained in https://github.com/jespb/Python-StdGP
+#
+# Copyright ©2019-2022 J. E. Batista
+#
+
+
+
+filename= "heart.csv"
+address = ("localhost", 6000)
+authkey = secrets.token_hex(16).encode()
+n_workers = 3
+
+if __name__ == "__main__":
+	# Start the workers. In a cluster, each machine runs Main_StdGP_worker.py
+	# with its own copy of the dataset
+	workers = [mp.Process(target=runWorker, args=(address, authkey, "datasets/"+filename)) for i in range(n_workers)]
+	for worker in workers:
+		worker.start()
+
+	# Open the dataset
+	ds = pandas.read_csv("datasets/"+filename)
+	class_header = ds.columns[-1]
+
+	# Split the dataset. The workers select the training rows using the index
+	Tr_X, Te_X, Tr_Y, Te_Y = train_test_split(ds.drop(columns=[class_header]), ds[class_header], 
+			train_size=0.7, random_state = 42, stratify = ds[class_header])
+
+	# Train a model, using the workers to evaluate the population
+	model = StdGP(backend=SocketBackend(address, authkey, min_workers=n_workers))
+	model.fit(Tr_X, Tr_Y)
+
+	# Predict test results
+	pred = model.predict(Te_X)
+
+	# Obtain test accuracy
+	print( accuracy_score(pred, Te_Y) )
+
+	for worker in workers:
+		worker.terminate()
+		worker.join()
@@ -1,6 +1,7 @@
 import pandas
 
 from stdgp.StdGP import StdGP
+from stdgp.DatasetCache import openDataset
 from sys import argv
 from Arguments import *
 import os
@@ -27,15 +28,31 @@ def openAndSplitDatasets(which,seed):
 	if VERBOSE:
 		print( "> Opening: ", which )
 
-	# Open dataset
-	ds = pandas.read_csv(DATASETS_DIR+which)
+	if not DATASET_CACHE:
+		# Open dataset
+		ds = pandas.read_csv(DATASETS_DIR+which)
 
-	# Read header
-	class_header = ds.columns[-1]
+		# Read header
+		class_header = ds.columns[-1]
 
-	return train_test_split(ds.drop(columns=[class_header]), ds[class_header], 
+		return train_test_split(ds.drop(columns=[class_header]), ds[class_header], 
+			train_size=TRAIN_FRACTION, random_state=seed, 
+			stratify = ds[class_header])
+
+	# Open the cached dataset (the CSV is only parsed if the cache is missing or outdated)
+	X, Y, columns, class_header = openDataset(DATASETS_DIR+which, DATASET_CACHE_DIR, DATASET_CACHE_VALIDATION)
+
+	# Split the row indices and build each set directly from the cached arrays
+	tr, te = train_test_split(np.arange(len(Y)), 
 		train_size=TRAIN_FRACTION, random_state=seed, 
-		stratify = ds[class_header])
+		stratify = Y)
+
+	Tr_X = pandas.DataFrame(X[tr], columns=columns, index=tr)
+	Te_X = pandas.DataFrame(X[te], columns=columns, index=te)
+	Tr_Y = pandas.Series(Y[tr], name=class_header, index=tr)
+	Te_Y = pandas.Series(Y[te], name=class_header, index=te)
+
+	return Tr_X, Te_X, Tr_Y, Te_Y
 
 
 def run(r,dataset):
@@ -49,7 +66,12 @@ def run(r,dataset):
 
 	# Train a model
 	model = StdGP(OPERATORS, MAX_DEPTH, POPULATION_SIZE, MAX_GENERATION, TOURNAMENT_SIZE, 
-		ELITISM_SIZE, LIMIT_DEPTH, THREADS, r, VERBOSE, MODEL_NAME, FITNESS_TYPE)
+		ELITISM_SIZE, LIMIT_DEPTH, threads=THREADS, random_state=r, verbose=VERBOSE, 
+		model_name=MODEL_NAME, fitnessType=FITNESS_TYPE, n_folds=N_FOLDS, 
+		erc_range=ERC_RANGE, backend=BACKEND, max_size=MAX_SIZE, bloat_control=BLOAT_CONTROL,
+		islands=ISLANDS, migration_interval=MIGRATION_INTERVAL, migration_size=MIGRATION_SIZE,
+		migration_topology=MIGRATION_TOPOLOGY, dtype=DTYPE,
+		semantic_cache=SEMANTIC_CACHE, interval_analysis=INTERVAL_ANALYSIS)
 	model.fit(Tr_X, Tr_Y, Te_X, Te_Y)
 
 
@@ -141,9 +163,19 @@ def call_StdGP():
 				file.write("\nTournament Size,"+str(TOURNAMENT_SIZE))
 				file.write("\nElitism Size,"+str(ELITISM_SIZE))
 				file.write("\nDepth Limit,"+str(LIMIT_DEPTH))
+				file.write("\nSize Limit,"+str(MAX_SIZE))
+				file.write("\nBloat Control,"+str(BLOAT_CONTROL))
 				file.write("\nWrapped Model,"+MODEL_NAME)
 				file.write("\nFitness Type,"+FITNESS_TYPE)
+				file.write("\nERC Range,"+str(ERC_RANGE).replace(",",";"))
 				file.write("\nThreads,"+str(THREADS))
+				file.write("\nBackend,"+str(BACKEND))
+				file.write("\nPrecision,"+DTYPE)
+				file.write("\nSemantic Cache,"+str(SEMANTIC_CACHE))
+				file.write("\nInterval Analysis,"+str(INTERVAL_ANALYSIS))
+				file.write("\nIslands,"+str(ISLANDS))
+				if ISLANDS > 1:
+					file.write("\nMigration,"+str(MIGRATION_SIZE)+" every "+str(MIGRATION_INTERVAL)+" generations ("+MIGRATION_TOPOLOGY+")")
 				file.write("\nRandom State,"+str(list(range(RUNS))))
 				file.write("\nDataset,"+dataset)
 
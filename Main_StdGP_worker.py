@@ -0,0 +1,36 @@
+from stdgp.Distributed import runWorker, DEFAULT_ADDRESS
+from sys import argv
+
+
+
+# 
+# By using this file, you are agreeing to this product's EULA
+#
+# This product can be obtained in https://github.com/jespb/Python-StdGP
+#
+# Copyright ©2019-2022 J. E. Batista
+#
+
+
+
+# Worker of the "socket" backend. Usage:
+#   python Main_StdGP_worker.py -address host:port -authkey key -d datasets/heart.csv
+
+ADDRESS = DEFAULT_ADDRESS
+AUTHKEY = None
+DATASET = None
+
+if "-address" in argv:
+	host, port = argv[argv.index("-address")+1].split(":")
+	ADDRESS = (host, int(port))
+
+if "-authkey" in argv:
+	AUTHKEY = argv[argv.index("-authkey")+1].encode()
+
+if "-d" in argv:
+	DATASET = argv[argv.index("-d")+1]
+
+if AUTHKEY is None:
+	exit("The -authkey of the coordinator is required.")
+
+runWorker(ADDRESS, AUTHKEY, DATASET)
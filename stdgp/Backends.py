@@ -0,0 +1,235 @@
+from concurrent.futures import ThreadPoolExecutor
+import multiprocessing as mp
+from .SparseData import SparseDataset
+
+import numpy as np
+import threading
+import heapq
+import os
+import time
+
+#
+# By using this file, you are agreeing to this product's EULA
+#
+# This product can be obtained in https://github.com/jespb/Python-StdGP
+#
+# Copyright ©2019-2022 J. E. Batista
+#
+
+# Number of task chunks per worker process; the chunks are balanced by their estimated cost
+CHUNKS_PER_WORKER = 4
+
+
+def getEvaluationCosts(individuals, n_rows):
+	'''
+	Returns the estimated cost of evaluating each individual: its number of
+	nodes times the number of rows.
+	'''
+	return [ind.getSize() * n_rows for ind in individuals]
+
+
+def getBalancedChunks(costs, n_chunks):
+	'''
+	Splits the tasks into at most n_chunks chunks with similar total costs: the
+	tasks are sorted from the most to the least expensive and each one is added
+	to the cheapest chunk (longest processing time first). Returns the chunks
+	(lists of task positions) from the most to the least expensive.
+	'''
+	order = sorted(range(len(costs)), key=lambda i: costs[i], reverse=True)
+	heap = [(0, c, []) for c in range(min(n_chunks, len(costs)))]
+	for i in order:
+		total, c, chunk = heapq.heappop(heap)
+		chunk.append(i)
+		heapq.heappush(heap, (total + costs[i], c, chunk))
+	heap.sort(reverse=True)
+	return [chunk for total, c, chunk in heap]
+
+
+def getWorkerTimes(busy, duration, n_workers=0):
+	'''
+	Returns the (busy, idle) time of each worker during an evaluation that took
+	"duration" seconds, given the busy time of each worker that received tasks.
+	The pool has n_workers workers; those without tasks are idle, (0, duration).
+	'''
+	times = [ (busy[w], max(0, duration - busy[w])) for w in sorted(busy, key=str) ]
+	return times + [ (0, duration) ] * max(0, n_workers - len(busy))
+
+
+class ThreadBackend:
+	'''
+	Evaluates the individuals concurrently in a pool of threads of the current
+	process. The training set is shared, not copied, and most of the work is
+	done by numpy operations that release the GIL.
+	'''
+	threads = None
+	executor = None
+	workerTimes = None
+
+	def __init__(self, threads):
+		self.threads = threads
+
+	def start(self, Tr_x, Tr_y, folds):
+		self.Tr_x = Tr_x
+		self.Tr_y = Tr_y
+		self.folds = folds
+		self.executor = ThreadPoolExecutor(max_workers=self.threads)
+
+	def evaluate(self, individuals):
+		# The threads take the most expensive individuals first
+		costs = getEvaluationCosts(individuals, len(self.Tr_y))
+		order = sorted(range(len(individuals)), key=lambda i: costs[i], reverse=True)
+
+		start = time.time()
+		busy = {}
+		for thread, duration in self.executor.map(self.fitIndividual, [individuals[i] for i in order]):
+			busy[thread] = busy.get(thread, 0) + duration
+		self.workerTimes = getWorkerTimes(busy, time.time() - start, self.threads)
+
+	def fitIndividual(self, ind):
+		start = time.time()
+		ind.getFitness(self.Tr_x, self.Tr_y, self.folds)
+		return threading.get_ident(), time.time() - start
+
+	def close(self):
+		if self.executor is not None:
+			self.executor.shutdown()
+			self.executor = None
+
+
+class ProcessBackend:
+	'''
+	Evaluates the individuals in a pool of worker processes, kept during the
+	whole fit. The training set is sent once to each worker, when the pool
+	starts. Each task sends one individual (without data) and its position;
+	the worker only returns the position, fitness, size and threshold, and
+	optionally the training predictions packed as a bitmap.
+	'''
+	threads = None
+	pool = None
+	prediction_storage = None
+	workerTimes = None
+	generation = 0
+
+	def __init__(self, threads, prediction_storage="uint8"):
+		self.threads = threads
+		self.prediction_storage = prediction_storage
+
+	def start(self, Tr_x, Tr_y, folds):
+		self.Tr_x = Tr_x
+		self.Tr_y = Tr_y
+		self.pool = mp.Pool(processes=self.threads, initializer=initWorker, 
+			initargs=(Tr_x, Tr_y, folds, self.prediction_storage != "none"))
+
+	def evaluate(self, individuals):
+		# Chunks balanced by the estimated cost, sent from the most expensive
+		costs = getEvaluationCosts(individuals, len(self.Tr_y))
+		chunks = getBalancedChunks(costs, self.threads * CHUNKS_PER_WORKER)
+		self.generation += 1
+		tasks = [ (self.generation, [(i, individuals[i]) for i in chunk]) for chunk in chunks ]
+
+		start = time.time()
+		busy = {}
+		for pid, duration, results in self.pool.imap_unordered(fitChunkTask, tasks):
+			busy[pid] = busy.get(pid, 0) + duration
+			for index, fitness, size, threshold, packed in results:
+				setEvaluationResult(individuals[index], fitness, size, threshold, packed, 
+					self.Tr_x, self.Tr_y, self.prediction_storage)
+		self.workerTimes = getWorkerTimes(busy, time.time() - start, self.threads)
+
+	def close(self):
+		if self.pool is not None:
+			self.pool.close()
+			self.pool.join()
+			self.pool = None
+
+
+def createBackend(name, threads, prediction_storage="uint8"):
+	'''
+	Returns the evaluation backend with the given name, or None for the serial
+	evaluation, which is done by StdGP itself. Backend objects (e.g., a
+	SocketBackend) are returned as they are.
+	'''
+	if not isinstance(name, str):
+		name.prediction_storage = prediction_storage
+		return name
+	if name == "serial":
+		return None
+	if name == "thread":
+		return ThreadBackend(threads)
+	if name == "process":
+		return ProcessBackend(threads, prediction_storage)
+	if name == "socket":
+		from .Distributed import SocketBackend
+		backend = SocketBackend()
+		backend.prediction_storage = prediction_storage
+		return backend
+	raise Exception("Unknown backend: "+str(name))
+
+
+# Training set of a worker process, set once by initWorker
+workerData = None
+
+# Generation of the last chunk evaluated by the worker process
+workerGeneration = None
+
+def initWorker(x, y, folds, send_predictions):
+	global workerData
+	workerData = (x, y, folds, send_predictions)
+
+def fitChunkTask(task):
+	'''
+	Evaluates a chunk of (position, individual) tasks of a generation in a
+	worker process. Returns the worker's process id, the time spent and, for
+	each individual, its position, fitness, size, model threshold and packed
+	training predictions (or None).
+	'''
+	global workerGeneration
+	start = time.time()
+	generation, chunk = task
+	x, y, folds, send_predictions = workerData
+	workerGeneration = clearGenerationCache(x, generation, workerGeneration)
+	results = [ (index,) + evaluateIndividual(ind, x, y, folds, send_predictions) for index, ind in chunk ]
+	return os.getpid(), time.time() - start, results
+
+
+def clearGenerationCache(x, generation, lastGeneration):
+	'''
+	Releases the dense columns of a worker's sparse training set when a new
+	generation starts, as StdGP does with its own datasets. Returns the
+	current generation.
+	'''
+	if generation != lastGeneration and isinstance(x, SparseDataset):
+		x.clearCache()
+	return generation
+
+
+def evaluateIndividual(ind, x, y, folds, send_predictions):
+	'''
+	Evaluates an individual away from the main process. Returns its fitness,
+	size, model threshold and packed training predictions (or None).
+	'''
+	fitness = ind.getFitness(x,y,folds)
+
+	packed = None
+	if send_predictions and not "FOLD" in ind.fitnessType:
+		packed = np.packbits(ind.getTrainingPredictions())
+
+	return fitness, ind.getSize(), ind.model.threshold, packed
+
+
+def setEvaluationResult(ind, fitness, size, threshold, packed, Tr_x, Tr_y, prediction_storage):
+	'''
+	Sets the results returned by evaluateIndividual in the main process's
+	individual. The model is rebuilt from its threshold.
+	'''
+	ind.fitness = fitness
+	ind.size = size
+	ind.model = ind.createModel()
+	ind.model.threshold = threshold
+	ind.training_X = Tr_x
+	ind.training_Y = Tr_y
+	if packed is not None:
+		ind.packedTrainingPredictions = (packed, len(Tr_y))
+		if prediction_storage == "uint8":
+			ind.trainingPredictions = ind.getTrainingPredictions()
+			ind.packedTrainingPredictions = None
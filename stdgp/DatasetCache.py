@@ -0,0 +1,160 @@
+import numpy as np
+
+import hashlib
+import json
+import os
+
+#
+# By using this file, you are agreeing to this product's EULA
+#
+# This product can be obtained in https://github.com/jespb/Python-StdGP
+#
+# Copyright ©2019-2022 J. E. Batista
+#
+
+CACHE_VERSION = 2
+
+
+def getCacheFilenames(filename, cache_dir=None, has_class=True):
+	'''
+	Returns the names of the metadata, features and labels files used to cache
+	a CSV dataset. By default, the cache is kept in a ".cache/" directory next
+	to the dataset. A dataset without a class column (has_class=False) has its
+	own cache, without a labels file (None).
+	'''
+	if cache_dir is None:
+		cache_dir = os.path.join(os.path.dirname(filename), ".cache")
+	base = os.path.join(cache_dir, os.path.basename(filename))
+	if not has_class:
+		base += ".features"
+		return base+".json", base+".X.npy", None
+	return base+".json", base+".X.npy", base+".Y.npy"
+
+
+def getFileHash(filename):
+	'''
+	Returns the SHA-1 hash of a file.
+	'''
+	h = hashlib.sha1()
+	with open(filename, "rb") as f:
+		for block in iter(lambda: f.read(1<<20), b""):
+			h.update(block)
+	return h.hexdigest()
+
+
+def getFileSignature(filename, validation="mtime"):
+	'''
+	Returns the values used to check if a cached dataset is still up to date.
+	'''
+	stat = os.stat(filename)
+	signature = {"mtime": stat.st_mtime_ns, "size": stat.st_size}
+	if validation == "hash":
+		signature["hash"] = getFileHash(filename)
+	return signature
+
+
+def writeCache(filename, cache_dir=None, validation="mtime", has_class=True):
+	'''
+	Parses a CSV dataset, whose last column is the class if has_class=True, and
+	stores it as binary arrays. The features are stored column by column, so a
+	column can be read without reading the others. The metadata file is written
+	last, so an interrupted conversion is never used.
+	'''
+	import pandas
+
+	meta_file, x_file, y_file = getCacheFilenames(filename, cache_dir, has_class)
+	os.makedirs(os.path.dirname(meta_file), exist_ok=True)
+
+	signature = getFileSignature(filename, validation)
+	ds = pandas.read_csv(filename)
+	class_header = ds.columns[-1] if has_class else None
+	columns = ds.columns[:-1] if has_class else ds.columns
+
+	X = ds[columns].to_numpy(dtype=np.float64)
+	np.save(x_file+".tmp.npy", np.asfortranarray(X))
+	os.replace(x_file+".tmp.npy", x_file)
+
+	labels = None
+	if has_class:
+		Y = ds[class_header]
+		if Y.dtype.kind not in "biuf":
+			codes, labels = pandas.factorize(Y)
+			Y = codes
+			labels = [str(label) for label in labels]
+		np.save(y_file+".tmp.npy", np.asarray(Y))
+		os.replace(y_file+".tmp.npy", y_file)
+		class_header = str(class_header)
+
+	meta = {"version": CACHE_VERSION,
+			"signature": signature,
+			"columns": [str(c) for c in columns],
+			"class_header": class_header,
+			"labels": labels}
+	with open(meta_file+".tmp", "w") as f:
+		json.dump(meta, f)
+	os.replace(meta_file+".tmp", meta_file)
+
+
+def isCacheValid(filename, cache_dir=None, validation="mtime", has_class=True):
+	'''
+	Returns True if the dataset has an up to date cache. The cache is invalidated
+	when the file's modification time or size change or, if validation="hash",
+	when its contents change.
+	'''
+	meta_file, x_file, y_file = getCacheFilenames(filename, cache_dir, has_class)
+	if not (os.path.exists(meta_file) and os.path.exists(x_file)):
+		return False
+	if y_file is not None and not os.path.exists(y_file):
+		return False
+
+	with open(meta_file) as f:
+		meta = json.load(f)
+	if meta.get("version") != CACHE_VERSION:
+		return False
+
+	cached = meta["signature"]
+	current = getFileSignature(filename, "mtime")
+	if validation == "hash":
+		if "hash" not in cached or (current["size"] != cached["size"]):
+			return False
+		if current["mtime"] == cached["mtime"]:
+			return True
+		return getFileHash(filename) == cached["hash"]
+	return current["mtime"] == cached["mtime"] and current["size"] == cached["size"]
+
+
+def openDataset(filename, cache_dir=None, validation="mtime", has_class=True):
+	'''
+	Returns the features (as a read-only memory-mapped float64 array), the
+	labels, the feature names and the class header of a CSV dataset. The CSV
+	is only parsed when it has no valid cache. With has_class=False, every
+	column is a feature and the labels and class header are None.
+	'''
+	if not isCacheValid(filename, cache_dir, validation, has_class):
+		writeCache(filename, cache_dir, validation, has_class)
+
+	meta_file, x_file, y_file = getCacheFilenames(filename, cache_dir, has_class)
+	with open(meta_file) as f:
+		meta = json.load(f)
+
+	X = np.load(x_file, mmap_mode="r")
+	Y = None
+	if has_class:
+		Y = np.load(y_file)
+		if meta["labels"] is not None:
+			Y = np.array(meta["labels"], dtype=object)[Y]
+
+	return X, Y, meta["columns"], meta["class_header"]
+
+
+def openColumns(filename, columns, cache_dir=None, validation="mtime", dtype=np.float64, has_class=False):
+	'''
+	Returns a dictionary from the names in "columns" to the features of a CSV
+	dataset, read from its cache. Only the pages of the cached file that hold
+	those features are read. The CSV is only parsed when it has no valid cache.
+	By default the file has no class column (e.g., new samples to be scored);
+	has_class=True uses the cache of a labelled dataset.
+	'''
+	X, Y, names, class_header = openDataset(filename, cache_dir, validation, has_class)
+	positions = dict( [(name, j) for j, name in enumerate(names)] )
+	return dict( [(name, np.array(X[:,positions[name]], dtype=dtype)) for name in columns] )
@@ -0,0 +1,418 @@
+from .Backends import evaluateIndividual, setEvaluationResult, getEvaluationCosts, getWorkerTimes, clearGenerationCache
+from .Evaluator import clearArenas
+from .SparseData import SparseDataset
+
+from multiprocessing.connection import Listener, Client, wait
+from multiprocessing import AuthenticationError
+from collections import deque
+import numpy as np
+import ipaddress
+import hashlib
+import secrets
+import threading
+import time
+
+#
+# By using this file, you are agreeing to this product's EULA
+#
+# This product can be obtained in https://github.com/jespb/Python-StdGP
+#
+# Copyright ©2019-2022 J. E. Batista
+#
+
+DEFAULT_ADDRESS = ("localhost", 6000)
+
+# Number of tasks sent to a worker before it returns a result
+TASKS_PER_WORKER = 2
+
+
+class WorkerConnection:
+	'''
+	Connection to a remote worker and the tasks it is evaluating.
+	'''
+	connection = None
+	address = None
+	tasks = None
+	lastSeen = None
+
+	def __init__(self, connection, address):
+		self.connection = connection
+		self.address = address
+		self.tasks = set()
+		self.lastSeen = time.time()
+
+
+class SocketBackend:
+	'''
+	Evaluates the individuals in worker processes, possibly in other machines,
+	connected over TCP (see runWorker). StdGP acts as the coordinator: it listens
+	on "address", sends the individuals (without data) and receives the same
+	results as the process backend.
+
+	Each worker loads the dataset once from its own local copy, and receives only
+	the index of the training rows and a hash of the training set. Workers
+	without a local copy, and workers whose selected rows do not match the hash
+	(e.g., the index is not the row numbers of the file, as in partial_fit or
+	with sparse datasets), receive the training set. Workers send heartbeats
+	while evaluating. The tasks of a worker
+	that disconnects or is not heard from for heartbeat_timeout seconds are sent
+	to the other workers. Workers can join at any time.
+
+	The workers receive pickled objects, so the connections are authenticated
+	with "authkey". An authkey is required if the address is not a loopback
+	address; otherwise, if none is given, a random key is generated and printed
+	for the workers.
+	'''
+	address = None
+	authkey = None
+	min_workers = None
+	heartbeat_timeout = None
+	connect_timeout = None
+	prediction_storage = None
+
+	listener = None
+	workers = None
+	closing = False
+	workerTimes = None
+	generation = 0
+
+	generatedKey = False
+
+	def __init__(self, address=DEFAULT_ADDRESS, authkey=None, min_workers=1, heartbeat_timeout=30, connect_timeout=60):
+		if authkey is None:
+			if not isLoopback(address):
+				raise Exception("An authkey is required to accept workers on a non-loopback address: "+str(address))
+			authkey = secrets.token_hex(16).encode()
+			self.generatedKey = True
+		self.address = address
+		self.authkey = authkey
+		self.min_workers = min_workers
+		self.heartbeat_timeout = heartbeat_timeout
+		self.connect_timeout = connect_timeout
+		self.prediction_storage = "uint8"
+
+	def __str__(self):
+		return "socket (%s:%d)" % tuple(self.address)
+
+	def __getstate__(self):
+		state = self.__dict__.copy()
+		state.pop("listener", None)
+		state.pop("workers", None)
+		state.pop("lock", None)
+		state.pop("acceptThread", None)
+		return state
+
+	def start(self, Tr_x, Tr_y, folds):
+		self.Tr_x = Tr_x
+		self.Tr_y = Tr_y
+		dtypes = set( [str(t) for t in Tr_x.dtypes] )
+		dtype = "float32" if dtypes == set(["float32"]) else None
+		# Sparse datasets have no file rows to select from, so the workers always receive them
+		rows, dataHash = None, None
+		if not isinstance(Tr_x, SparseDataset):
+			rows, dataHash = np.asarray(Tr_x.index), getDatasetHash(Tr_x, Tr_y)
+		self.startMessage = ("start", list(Tr_x.columns), rows, dataHash, folds, self.prediction_storage != "none", dtype)
+
+		self.workers = []
+		self.lock = threading.Lock()
+		self.closing = False
+		self.listener = Listener(self.address, authkey=self.authkey)
+		if self.generatedKey:
+			print("[Info] Workers must connect to %s with the authkey %s" % (str(self), self.authkey.decode()))
+		self.acceptThread = threading.Thread(target=self.acceptWorkers, daemon=True)
+		self.acceptThread.start()
+
+		if not self.waitForWorkers(self.min_workers):
+			self.close()
+			raise Exception("Only %d of %d workers connected." % (len(self.workers), self.min_workers))
+
+	def acceptWorkers(self):
+		'''
+		Accepts the workers' connections until the backend is closed.
+		'''
+		while True:
+			try:
+				connection = self.listener.accept()
+			except (OSError, AuthenticationError):
+				if self.closing:
+					return
+				continue
+			if self.closing:
+				connection.close()
+				return
+
+			try:
+				hello, has_dataset = connection.recv()
+				if has_dataset:
+					# The worker answers "ready" if its rows match the training set
+					connection.send(self.startMessage)
+					reply = connection.recv()
+					if reply[0] == "data":
+						connection.send( (self.Tr_x, self.Tr_y) )
+					elif reply[0] == "error":
+						print("[Warning] Worker %s failed: %s" % (str(self.listener.last_accepted), reply[1]))
+						connection.close()
+						continue
+				else:
+					connection.send(self.startMessage + (self.Tr_x, self.Tr_y))
+			except (OSError, EOFError):
+				connection.close()
+				continue
+			with self.lock:
+				self.workers.append( WorkerConnection(connection, self.listener.last_accepted) )
+
+	def waitForWorkers(self, n):
+		'''
+		Waits up to connect_timeout seconds for "n" workers. Returns True if they connected.
+		'''
+		deadline = time.time() + self.connect_timeout
+		while time.time() < deadline:
+			with self.lock:
+				if len(self.workers) >= n:
+					return True
+			time.sleep(0.1)
+		return False
+
+	def evaluate(self, individuals):
+		self.generation += 1
+
+		# The most expensive individuals are sent first
+		costs = getEvaluationCosts(individuals, len(self.Tr_y))
+		pending = deque( sorted(range(len(individuals)), key=lambda i: costs[i], reverse=True) )
+		done = set()
+		start = time.time()
+		busy = {}
+
+		while len(done) < len(individuals):
+			with self.lock:
+				workers = list(self.workers)
+			if not workers:
+				if not self.waitForWorkers(1):
+					raise Exception("No workers connected.")
+				continue
+
+			# Send tasks to the workers with free slots
+			for worker in workers:
+				busy.setdefault(worker.address, 0) # workers without tasks are reported as idle
+				if not worker.tasks:
+					worker.lastSeen = time.time()
+				while len(worker.tasks) < TASKS_PER_WORKER and pending:
+					index = pending.popleft()
+					if index in done:
+						continue
+					try:
+						worker.connection.send( ("task", index, individuals[index], self.generation) )
+					except OSError:
+						pending.appendleft(index)
+						self.dropWorker(worker, pending, done)
+						break
+					worker.tasks.add(index)
+
+			connections = dict( [(worker.connection, worker) for worker in workers if worker.tasks] )
+			for connection in wait(list(connections), timeout=1):
+				worker = connections[connection]
+				try:
+					message = connection.recv()
+				except (OSError, EOFError):
+					self.dropWorker(worker, pending, done)
+					continue
+
+				worker.lastSeen = time.time()
+				if message[0] == "result":
+					index, duration, fitness, size, threshold, packed = message[1:]
+					worker.tasks.discard(index)
+					busy[worker.address] = busy.get(worker.address, 0) + duration
+					if index not in done:
+						setEvaluationResult(individuals[index], fitness, size, threshold, packed,
+							self.Tr_x, self.Tr_y, self.prediction_storage)
+						done.add(index)
+				elif message[0] == "error":
+					print("[Warning] Worker %s failed: %s" % (str(worker.address), message[1]))
+					self.dropWorker(worker, pending, done)
+
+			# Workers that stopped sending heartbeats
+			for worker in connections.values():
+				if worker.tasks and time.time() - worker.lastSeen > self.heartbeat_timeout:
+					print("[Warning] Worker %s lost. Its tasks are sent to the other workers." % str(worker.address))
+					self.dropWorker(worker, pending, done)
+
+		self.workerTimes = getWorkerTimes(busy, time.time() - start)
+
+	def dropWorker(self, worker, pending, done):
+		'''
+		Closes the connection to a worker and queues its unfinished tasks again.
+		'''
+		with self.lock:
+			if worker in self.workers:
+				self.workers.remove(worker)
+		try:
+			worker.connection.close()
+		except OSError:
+			pass
+		pending.extend( [index for index in worker.tasks if index not in done] )
+		worker.tasks = set()
+
+	def close(self):
+		if self.listener is not None:
+			# A connection wakes up the thread waiting for workers
+			self.closing = True
+			try:
+				Client(self.listener.address, authkey=self.authkey).close()
+			except OSError:
+				pass
+			self.acceptThread.join()
+			self.listener.close()
+			self.listener = None
+
+		with self.lock:
+			workers = self.workers
+			self.workers = []
+		for worker in workers:
+			try:
+				worker.connection.send( ("stop",) )
+				worker.connection.close()
+			except OSError:
+				pass
+
+
+def getDatasetHash(X, Y):
+	'''
+	Returns a hash of the values of a training set, used by the workers to
+	check the rows selected from their local copy.
+	'''
+	h = hashlib.blake2b(digest_size=16)
+	h.update( repr([str(name) for name in X.columns]).encode() )
+	for name in X.columns:
+		h.update( np.ascontiguousarray(np.asarray(X[name], dtype=np.float64)).tobytes() )
+	Y = np.asarray(Y)
+	Y = Y.astype(np.float64) if Y.dtype.kind in "biuf" else Y.astype(str)
+	h.update( np.ascontiguousarray(Y).tobytes() )
+	return h.hexdigest()
+
+
+def selectRows(data, columns, rows, dataHash, dtype):
+	'''
+	Returns the training set selected from a worker's local copy, or None if
+	the rows cannot be selected or do not match the coordinator's training set.
+	'''
+	if data is None or rows is None:
+		return None
+	X, Y = data
+	if list(X.columns) != columns:
+		return None
+	try:
+		Tr_x, Tr_y = X.loc[rows], Y.loc[rows]
+	except (KeyError, IndexError):
+		return None
+	if dtype is not None:
+		Tr_x = Tr_x.astype(dtype) # same precision as the coordinator's training set
+	if getDatasetHash(Tr_x, Tr_y) != dataHash:
+		return None
+	return Tr_x, Tr_y
+
+
+def loadDataset(filename):
+	'''
+	Returns the features and labels of a CSV dataset whose last column is the class.
+	'''
+	import pandas
+	ds = pandas.read_csv(filename)
+	class_header = ds.columns[-1]
+	return ds.drop(columns=[class_header]), ds[class_header]
+
+
+def isLoopback(address):
+	'''
+	Returns True if a (host, port) address only accepts connections from the
+	same machine.
+	'''
+	host = address[0]
+	if host == "localhost":
+		return True
+	try:
+		return ipaddress.ip_address(host).is_loopback
+	except ValueError:
+		return False
+
+
+def runWorker(address, authkey, dataset=None, heartbeat_interval=5, reconnect_timeout=60):
+	'''
+	Connects to a SocketBackend and evaluates its tasks. "authkey" is the
+	coordinator's authentication key. "dataset" is the worker's local copy of
+	the CSV dataset (if None, the training set is received from the
+	coordinator). After each fit, the worker connects again, and stops when no
+	coordinator is found for reconnect_timeout seconds.
+	'''
+	data = None if dataset is None else loadDataset(dataset)
+
+	while True:
+		connection = None
+		deadline = time.time() + reconnect_timeout
+		while connection is None and time.time() < deadline:
+			try:
+				connection = Client(address, authkey=authkey)
+			except OSError:
+				time.sleep(0.5)
+		if connection is None:
+			return
+
+		try:
+			serveCoordinator(connection, data, heartbeat_interval)
+		except (OSError, EOFError):
+			pass
+		finally:
+			connection.close()
+
+
+def serveCoordinator(connection, data, heartbeat_interval):
+	connection.send( ("hello", data is not None) )
+	message = connection.recv()
+	columns, rows, dataHash, folds, send_predictions, dtype = message[1:7]
+	if data is None:
+		Tr_x, Tr_y = message[7:9]
+	else:
+		# The training set is received if the local copy does not match it
+		try:
+			selected = selectRows(data, columns, rows, dataHash, dtype)
+		except Exception as e:
+			connection.send( ("error", repr(e)) )
+			return
+		if selected is None:
+			connection.send( ("data",) )
+			Tr_x, Tr_y = connection.recv()
+		else:
+			connection.send( ("ready",) )
+			Tr_x, Tr_y = selected
+
+	# The heartbeats are sent by another thread while the individuals are evaluated
+	lock = threading.Lock()
+	stopped = threading.Event()
+	def sendHeartbeats():
+		while not stopped.wait(heartbeat_interval):
+			try:
+				with lock:
+					connection.send( ("heartbeat",) )
+			except OSError:
+				return
+	threading.Thread(target=sendHeartbeats, daemon=True).start()
+
+	generation = None
+	try:
+		while True:
+			message = connection.recv()
+			if message[0] == "stop":
+				return
+			index, ind, task_generation = message[1:]
+			generation = clearGenerationCache(Tr_x, task_generation, generation)
+			start = time.time()
+			try:
+				result = evaluateIndividual(ind, Tr_x, Tr_y, folds, send_predictions)
+			except Exception as e:
+				with lock:
+					connection.send( ("error", repr(e)) )
+				return
+			with lock:
+				connection.send( ("result", index, time.time() - start) + result )
+	finally:
+		stopped.set()
+		clearArenas()
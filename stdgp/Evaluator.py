@@ -0,0 +1,243 @@
+import numpy as np
+
+import threading
+
+#
+# By using this file, you are agreeing to this product's EULA
+#
+# This product can be obtained in https://github.com/jespb/Python-StdGP
+#
+# Copyright ©2019-2022 J. E. Batista
+#
+
+TERMINAL = 0
+CONSTANT = 1
+OPERATOR = 2
+
+
+class BufferArena:
+	'''
+	Pool of reusable evaluation buffers with the same length and dtype.
+	'''
+	n = None
+	dtype = None
+
+	def __init__(self, n, dtype):
+		self.n = n
+		self.dtype = dtype
+		self.free = []
+		self.freeMasks = []
+
+	def get(self):
+		return self.free.pop() if self.free else np.empty(self.n, dtype=self.dtype)
+
+	def release(self, buffer):
+		self.free.append(buffer)
+
+	def getMask(self):
+		return self.freeMasks.pop() if self.freeMasks else np.empty(self.n, dtype=bool)
+
+	def releaseMask(self, mask):
+		self.freeMasks.append(mask)
+
+
+# Each thread (and each worker process) keeps its own arenas
+localArenas = threading.local()
+
+# Number of arenas kept by each thread; the least recently used are released
+# (e.g., the arenas of the racing blocks or of previous training windows)
+MAX_ARENAS = 4
+
+def getArena(n, dtype=np.float64):
+	'''
+	Returns the calling thread's arena for buffers of length "n".
+	'''
+	arenas = getattr(localArenas, "arenas", None)
+	if arenas is None:
+		arenas = localArenas.arenas = {}
+	key = (n, np.dtype(dtype))
+	arena = arenas.pop(key, None)
+	if arena is None:
+		arena = BufferArena(n, dtype)
+		if len(arenas) >= MAX_ARENAS:
+			del arenas[next(iter(arenas))]
+	arenas[key] = arena # most recently used last
+	return arena
+
+def clearArenas():
+	'''
+	Releases the buffers kept by the calling thread.
+	'''
+	localArenas.arenas = {}
+
+
+def compileNode(node, program=None):
+	'''
+	Returns the program (postfix list of instructions) that evaluates a Node.
+	'''
+	if program is None:
+		program = []
+	if node.branches == None:
+		if node.isConstant():
+			program.append( (CONSTANT, node.value) )
+		else:
+			program.append( (TERMINAL, node.value) )
+	else:
+		for b in node.branches:
+			compileNode(b, program)
+		program.append( (OPERATOR, node.value, len(node.branches)) )
+	return program
+
+
+def calculateScalar(op, args, dtype=np.float64):
+	'''
+	Applies an operator to scalar arguments.
+	'''
+	if op == "+":
+		return args[0] + args[1]
+	if op == "-":
+		return args[0] - args[1]
+	if op == "*":
+		return args[0] * args[1]
+	if op == "/":
+		return args[0] / (args[1] if isDivisor(args[1], dtype) else 1)
+	if op == "log2":
+		return args[0] if args[0] <= 0 else np.log2(args[0])
+	if op == "max":
+		return max(args)
+	raise Exception("Unknown operator: "+str(op))
+
+
+# In float32, divisors below the smallest normal number are treated as 0, as
+# dividing by them overflows (or underflows to subnormals, which are slow)
+FLOAT32_TINY = np.finfo(np.float32).tiny
+
+def isDivisor(value, dtype=np.float64):
+	'''
+	Returns False if the protected division treats a scalar divisor as 0.
+	'''
+	if np.dtype(dtype) == np.float32:
+		return abs(value) >= FLOAT32_TINY
+	return value != 0
+
+def getDivisorMask(divisor, arena):
+	'''
+	Returns a mask (from the arena) with the rows whose divisor is not treated as 0.
+	'''
+	mask = arena.getMask()
+	if arena.dtype == np.float32:
+		magnitude = np.abs(divisor, out=arena.get())
+		np.greater_equal(magnitude, FLOAT32_TINY, out=mask)
+		arena.release(magnitude)
+	else:
+		np.not_equal(divisor, 0, out=mask)
+	return mask
+
+
+def calculateOperator(op, args, owned, arena):
+	'''
+	Applies an operator to arrays (or scalars), writing the result into a
+	buffer owned by one of the arguments or taken from the arena. Returns the
+	result buffer; the other owned buffers are released.
+	'''
+	# Only the first two arguments' buffers can hold the result: the divisor is
+	# still read after the dividend is copied into the result, and the other
+	# arguments of max are read after the first two are compared
+	reusable = 1 if op == "/" else 2
+
+	out = None
+	release = []
+	for i in range(len(args)):
+		if owned[i] and out is None and i < reusable:
+			out = args[i]
+		elif owned[i]:
+			release.append(args[i])
+	if out is None:
+		out = arena.get()
+
+	if op == "+":
+		np.add(args[0], args[1], out=out)
+	elif op == "-":
+		np.subtract(args[0], args[1], out=out)
+	elif op == "*":
+		np.multiply(args[0], args[1], out=out)
+	elif op == "/":
+		# Protected division: X / 0 == X
+		if out is not args[0]:
+			np.copyto(out, args[0])
+		if np.ndim(args[1]) == 0:
+			if isDivisor(args[1], arena.dtype):
+				np.divide(out, args[1], out=out)
+		else:
+			mask = getDivisorMask(args[1], arena)
+			np.divide(out, args[1], out=out, where=mask)
+			arena.releaseMask(mask)
+	elif op == "log2":
+		# Protected logarithm: log2(X) == X if X <= 0
+		if out is not args[0]:
+			np.copyto(out, args[0])
+		mask = np.greater(out, 0, out=arena.getMask())
+		np.log2(out, out=out, where=mask)
+		arena.releaseMask(mask)
+	elif op == "max":
+		np.maximum(args[0], args[1], out=out)
+		for a in args[2:]:
+			np.maximum(out, a, out=out)
+	else:
+		raise Exception("Unknown operator: "+str(op))
+
+	for buffer in release:
+		arena.release(buffer)
+	return out
+
+
+def getNumberOfRows(sample):
+	'''
+	Returns the number of rows of a sample (a DataFrame or a mapping from
+	terminal names to columns).
+	'''
+	if hasattr(sample, "shape"):
+		return sample.shape[0]
+	return len(next(iter(sample.values())))
+
+
+def evaluate(program, sample, dtype=np.float64):
+	'''
+	Runs a program on a sample (a DataFrame or a mapping from terminal names
+	to columns). Intermediate results are written into buffers reused from the
+	calling thread's arena, so the number of buffers in use is bounded by the
+	depth of the tree. Constants are scalars that are broadcast.
+
+	Returns a new array, or a scalar if the tree is constant.
+	'''
+	arena = None
+	stack = []
+	owned = []
+	for instruction in program:
+		kind = instruction[0]
+		if kind == TERMINAL:
+			stack.append( np.asarray(sample[instruction[1]]) )
+			owned.append( False )
+		elif kind == CONSTANT:
+			stack.append( dtype(instruction[1]) )
+			owned.append( False )
+		else:
+			op, n_args = instruction[1], instruction[2]
+			args = stack[-n_args:]
+			args_owned = owned[-n_args:]
+			del stack[-n_args:]
+			del owned[-n_args:]
+
+			if all( [np.ndim(a) == 0 for a in args] ):
+				stack.append( dtype(calculateScalar(op, args, dtype)) )
+				owned.append( False )
+			else:
+				if arena is None:
+					arena = getArena(getNumberOfRows(sample), dtype)
+				stack.append( calculateOperator(op, args, args_owned, arena) )
+				owned.append( True )
+
+	result = stack[0]
+	if owned[0] or np.ndim(result) == 0:
+		return result
+	return np.array(result)
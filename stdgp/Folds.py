@@ -0,0 +1,38 @@
+import numpy as np
+
+#
+# By using this file, you are agreeing to this product's EULA
+#
+# This product can be obtained in https://github.com/jespb/Python-StdGP
+#
+# Copyright ©2019-2022 J. E. Batista
+#
+
+
+def getStratifiedFolds(Y, k, rng):
+	'''
+	Returns a list with the (training rows, validation rows) index arrays of
+	"k" stratified folds. The rows of each class are shuffled using numpy's
+	random Generator "rng" and dealt to the folds in turn.
+	'''
+	Y = np.asarray(Y)
+	fold_of_row = np.empty(len(Y), dtype=np.int64)
+
+	offset = 0
+	for label in np.unique(Y):
+		rows = np.flatnonzero(Y == label)
+		rng.shuffle(rows)
+		fold_of_row[rows] = (offset + np.arange(len(rows))) % k
+		offset += len(rows)
+
+	return [ (np.flatnonzero(fold_of_row != i), np.flatnonzero(fold_of_row == i)) for i in range(k) ]
+
+
+def getContiguousFolds(n, k):
+	'''
+	Returns a list with the (training rows, validation rows) index arrays of
+	"k" folds made of contiguous rows, in the original row order.
+	'''
+	bounds = [ (n*i)//k for i in range(k+1) ]
+	rows = np.arange(n)
+	return [ (np.concatenate([rows[:bounds[i]], rows[bounds[i+1]:]]), rows[bounds[i]:bounds[i+1]]) for i in range(k) ]
@@ -123,6 +123,34 @@ def discardDeep(population, limit):
 	return ret
 
 
+def discardLarge(population, limit):
+	'''
+	Returns the Individuals with at most "limit" nodes.
+	'''
+	ret = []
+	for ind in population:
+		if ind.getSize() <= limit:
+			ret.append(ind)
+	return ret
+
+
+def tarpeian(rng, population, rate):
+	'''
+	Tarpeian bloat control: each Individual that has not been evaluated and is
+	larger than the average size of the population gets, with probability
+	"rate", the worst possible fitness without being evaluated.
+
+	Returns the number of Individuals that were penalized.
+	'''
+	average = sum( [ind.getSize() for ind in population] ) / len(population)
+	count = 0
+	for ind in population:
+		if ind.fitness is None and ind.getSize() > average and rng.random() < rate:
+			ind.fitness = float("-inf")
+			count += 1
+	return count
+
+
 def STXO(rng, population, tournament_size, Sf, Sp, Switch):
 	'''
 	Randomly selects one node from each of two individuals; swaps the node and
@@ -144,7 +172,7 @@ def STXO(rng, population, tournament_size, Sf, Sp, Switch):
 
 	ret = []
 	for h in [h1,h2]:
-		i = Individual(ind1.operators, ind1.terminals, ind1.max_depth, ind1.model_name, ind1.fitnessType)
+		i = Individual(ind1.operators, ind1.terminals, ind1.max_depth, ind1.model_name, ind1.fitnessType, ind1.dtype)
 		i.copy(h)
 		ret.append(i)
 	return ret
@@ -167,7 +195,7 @@ def STMUT(rng, population, tournament_size, Sf, Sp, Switch):
 
 
 	ret = []
-	i = Individual(ind1.operators, ind1.terminals, ind1.max_depth, ind1.model_name, ind1.fitnessType)
+	i = Individual(ind1.operators, ind1.terminals, ind1.max_depth, ind1.model_name, ind1.fitnessType, ind1.dtype)
 	i.copy(h1)
 	ret.append(i)
 	return ret
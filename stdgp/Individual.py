@@ -1,9 +1,11 @@
 from .Node import Node
-from .SimpleThresholdClassifier import SimpleThresholdClassifier
+from .SimpleThresholdClassifier import SimpleThresholdClassifier, THRESHOLD_FITTING
+from .Metrics import getClassificationMeasures, getAccuracyScore, getWaFScore, getKappaScore, getMeanSquaredError
+from .Folds import getContiguousFolds
+from .Evaluator import compileNode, evaluate, getNumberOfRows
 
-import pandas as pd
-
-from sklearn.metrics import accuracy_score, f1_score, cohen_kappa_score, mean_squared_error
+import numpy as np
+import sys
 
 
 
@@ -15,6 +17,9 @@ from sklearn.metrics import accuracy_score, f1_score, cohen_kappa_score, mean_sq
 # Copyright ©2019-2022 J. E. Batista
 #
 
+# Approximate memory used by each Node object (instance, attribute dict and branch list)
+NODE_MEMORY = 200
+
 class Individual:
 	training_X = None
 	training_Y = None
@@ -23,30 +28,69 @@ class Individual:
 	terminals = None
 	max_depth = None
 
-	head = None
+	tree = None
+	program = None
+	encoding = None
+	encodingIndex = None
 	size = 0
 	depth = 0
 
 	trainingPredictions = None
+	packedTrainingPredictions = None
 	testPredictions = None
 	fitness = None
 
 	model = None
 
-	def __init__(self, operators, terminals, max_depth, model_name="SimpleThresholdClassifier", fitnessType="Accuracy"):
+	dtype = np.float64
+
+	def __init__(self, operators, terminals, max_depth, model_name="SimpleThresholdClassifier", fitnessType="Accuracy", dtype=np.float64):
 		self.operators = operators
 		self.terminals = terminals
 		self.max_depth = max_depth
 		self.model_name = model_name
 		self.fitnessType = fitnessType
+		self.dtype = dtype
 
 	def create(self,rng):
 		self.head = Node()
 		self.head.create(rng, self.operators, self.terminals, self.max_depth, full=True)
+
+	def createFromEncoding(self, encoding, index):
+		'''
+		Uses the tree "index" of a PopulationEncoding. The Node objects are only
+		built when the tree is first needed.
+		'''
+		self.encoding = encoding
+		self.encodingIndex = index
+		self.size = int(encoding.sizes[index])
+		self.depth = int(encoding.depths[index])
 		
 	def copy(self, head):
 		self.head = head
 
+	@property
+	def head(self):
+		if self.tree is None and self.encoding is not None:
+			self.tree = self.encoding.decode(self.encodingIndex)
+			self.encoding = None
+		return self.tree
+
+	@head.setter
+	def head(self, head):
+		self.tree = head
+		self.program = None
+		self.encoding = None
+
+	def getProgram(self):
+		'''
+		Returns the program used to evaluate the individual, compiled from a copy
+		of the head with its constant subtrees folded.
+		'''
+		if self.program is None:
+			self.program = compileNode(self.head.fold())
+		return self.program
+
 
 
 	def __gt__(self, other):
@@ -66,9 +110,22 @@ class Individual:
 		return str(self.head)
 
 
+	def __getstate__(self):
+		'''
+		The training set is shared by the whole population and kept by StdGP,
+		so it is not pickled with the individual.
+		'''
+		self.head # decode the tree instead of pickling the population encoding
+		state = self.__dict__.copy()
+		state.pop("training_X", None)
+		state.pop("training_Y", None)
+		state.pop("program", None)
+		return state
+
+
 	def createModel(self):
-		if self.model_name == "SimpleThresholdClassifier":
-			return SimpleThresholdClassifier()
+		if self.model_name in THRESHOLD_FITTING:
+			return SimpleThresholdClassifier(fitting=THRESHOLD_FITTING[self.model_name])
 
 
 	def fit(self, Tr_x, Tr_y):
@@ -85,6 +142,20 @@ class Individual:
 
 			self.model.fit(hyper_X,Tr_y)
 
+			# The training predictions reuse the converted training set
+			if self.trainingPredictions is None:
+				self.trainingPredictions = self.model.predict(hyper_X)
+
+	def fitSemantics(self, semantics, Tr_x, Tr_y):
+		'''
+		Trains the classifier using the outputs already computed on the training set.
+		'''
+		self.training_X = Tr_x
+		self.training_Y = Tr_y
+		self.model = self.createModel()
+		self.model.fit(semantics, Tr_y)
+		self.trainingPredictions = self.model.predict(semantics)
+
 	def getHead(self):
 		return self.head.clone()
 
@@ -110,9 +181,12 @@ class Individual:
 
 
 
-	def getFitness(self, tr_x = None, tr_y = None):
+	def getFitness(self, tr_x = None, tr_y = None, folds = None, semantics = None):
 		'''
-		Returns the individual's fitness.
+		Returns the individual's fitness. The 2FOLD and KFOLD fitness use "folds",
+		a list of (training rows, validation rows) index arrays; 2FOLD defaults to
+		the two halves of the training set. "semantics" are the outputs on the 
+		training set, if already computed.
 		'''
 		if self.fitness is None:
 			if not tr_x is None:
@@ -124,75 +198,115 @@ class Individual:
 			if self.fitnessType == "Accuracy":
 				self.fit(self.training_X, self.training_Y)
 				self.getTrainingPredictions()
-				acc = accuracy_score(self.trainingPredictions, self.training_Y)
+				acc = getAccuracyScore(self.trainingPredictions, self.training_Y)
 				self.fitness = acc 
 
 			if self.fitnessType == "MSE":
 				self.fit(self.training_X, self.training_Y)
 				self.getTrainingPredictions()
-				mse = -1 * mean_squared_error(self.trainingPredictions, self.training_Y)
+				mse = -1 * getMeanSquaredError(self.trainingPredictions, self.training_Y)
 				self.fitness = mse 
 
 			if self.fitnessType == "WAF":
 				self.fit(self.training_X, self.training_Y)
 				self.getTrainingPredictions()
-				waf = f1_score(self.trainingPredictions, self.training_Y, average="weighted")
+				waf = getWaFScore(self.trainingPredictions, self.training_Y)
 				self.fitness = waf 
 
-			if self.fitnessType == "2FOLD":
-				hyper_X = self.convert(self.training_X)
-
-				X1 = hyper_X.iloc[:len(hyper_X)//2]
-				Y1 = self.training_Y[:len(self.training_Y)//2]
-				X2 = hyper_X.iloc[len(hyper_X)//2:]
-				Y2 = self.training_Y[len(self.training_Y)//2:]
+			if self.fitnessType in ["2FOLD", "KFOLD"]:
+				if folds is None:
+					if self.fitnessType == "KFOLD":
+						raise Exception("The KFOLD fitness requires the fold indices.")
+					folds = getContiguousFolds(len(self.training_Y), 2)
 
-				M1 = self.createModel()
-				M1.fit(X1,Y1)
-				P1 = M1.predict(X2)
+				# The semantics are computed once and shared by every fold
+				if semantics is None:
+					semantics = self.calculate(self.training_X)
+				Y = np.asarray(self.training_Y)
 
-				M2 = self.createModel()
-				M2.fit(X2,Y2)
-				P2 = M2.predict(X1)
+				scores = []
+				for train, test in folds:
+					M = self.createModel()
+					M.fit(semantics[train], Y[train])
+					scores.append( np.mean(M.predict(semantics[test]) == Y[test]) )
+				self.fitness = np.mean(scores)
 
-				f1 = accuracy_score(P1, Y2)
-				f2 = accuracy_score(P2, Y1)
-				self.fitness = (f1+f2)/2
+				if self.model is None:
+					self.model = self.createModel()
+					self.model.fit(semantics, Y)
 
 		return self.fitness
 
 
+	def resetFitness(self, tr_x, tr_y):
+		'''
+		Discards the fitness, model and predictions, which are computed again on
+		the new training set.
+		'''
+		self.training_X = tr_x
+		self.training_Y = tr_y
+		self.fitness = None
+		self.model = None
+		self.trainingPredictions = None
+		self.packedTrainingPredictions = None
+		self.testPredictions = None
+
+	def slideTrainingSet(self, X, Y, tr_x, tr_y):
+		'''
+		Re-scores the individual on a new training set made of the last rows of the
+		previous one followed by the new rows X and Y. The model is kept and only
+		the new rows are evaluated. Returns False, without changes, if the individual
+		has no stored training predictions.
+		'''
+		if self.fitness is None or self.model is None:
+			return False
+		if self.trainingPredictions is None and self.packedTrainingPredictions is None:
+			return False
+
+		pred = np.concatenate([self.getTrainingPredictions(), self.predict(X)])
+		self.training_X = tr_x
+		self.training_Y = tr_y
+		self.trainingPredictions = pred[len(pred)-len(tr_y):]
+		self.packedTrainingPredictions = None
+		self.fitness = None
+		self.getFitness()
+		return True
+
+
 	def getTrainingMeasure(self):
-		if self.fitnessType in ["Accuracy", "2FOLD"]:
+		if self.fitnessType in ["Accuracy", "2FOLD", "KFOLD"]:
 			self.getTrainingPredictions()
-			return accuracy_score(self.trainingPredictions, self.training_Y)
+			return getAccuracyScore(self.trainingPredictions, self.training_Y)
 			
 		if self.fitnessType == "MSE":
 			self.getTrainingPredictions()
-			return -1 * mean_squared_error(self.trainingPredictions, self.training_Y)
+			return -1 * getMeanSquaredError(self.trainingPredictions, self.training_Y)
 
 		if self.fitnessType == "WAF":
 			self.getTrainingPredictions()
-			return f1_score(self.trainingPredictions, self.training_Y, average="weighted")
+			return getWaFScore(self.trainingPredictions, self.training_Y)
 
 
 	def getTestMeasure(self, test_X, test_Y):
-		if self.fitnessType in ["Accuracy", "2FOLD"]:
+		if self.fitnessType in ["Accuracy", "2FOLD", "KFOLD"]:
 			self.getTestPredictions(test_X)
-			return accuracy_score(self.testPredictions, test_Y)
+			return getAccuracyScore(self.testPredictions, test_Y)
 			
 		if self.fitnessType == "MSE":
 			self.getTestPredictions(test_X)
-			return -1 * mean_squared_error(self.testPredictions, test_Y)
+			return -1 * getMeanSquaredError(self.testPredictions, test_Y)
 
 		if self.fitnessType == "WAF":
 			self.getTestPredictions(test_X)
-			return f1_score(self.testPredictions, test_Y, average="weighted")
+			return getWaFScore(self.testPredictions, test_Y)
 
 
 
 	def getTrainingPredictions(self):
 		if self.trainingPredictions is None:
+			if self.packedTrainingPredictions is not None:
+				packed, count = self.packedTrainingPredictions
+				return np.unpackbits(packed, count=count)
 			self.trainingPredictions = self.predict(self.training_X)
 
 		return self.trainingPredictions
@@ -204,6 +318,39 @@ class Individual:
 		return self.testPredictions
 
 
+	def packPredictions(self):
+		'''
+		Stores the training predictions as a bitmap. Only valid for 0/1 predictions.
+		'''
+		if self.trainingPredictions is not None:
+			pred = np.asarray(self.trainingPredictions, dtype=np.uint8)
+			self.packedTrainingPredictions = (np.packbits(pred), len(pred))
+			self.trainingPredictions = None
+
+	def dropPredictions(self):
+		'''
+		Discards the stored predictions. They are recomputed if needed.
+		'''
+		self.trainingPredictions = None
+		self.packedTrainingPredictions = None
+		self.testPredictions = None
+
+	def getMemoryEstimate(self):
+		'''
+		Returns an estimate, in bytes, of the memory used by this individual,
+		excluding the shared training set.
+		'''
+		memory = sys.getsizeof(self) + sys.getsizeof(self.__dict__)
+		memory += NODE_MEMORY * self.getSize()
+		for pred in [self.trainingPredictions, self.testPredictions]:
+			if isinstance(pred, np.ndarray):
+				memory += pred.nbytes
+			elif pred is not None:
+				memory += sys.getsizeof(pred) + sum(sys.getsizeof(v) for v in pred)
+		if self.packedTrainingPredictions is not None:
+			memory += self.packedTrainingPredictions[0].nbytes
+		return memory
+
 	
 	def getMSE(self, X,Y,pred=None):
 		'''
@@ -216,7 +363,7 @@ class Individual:
 		else:
 			pred = self.predict(X)
 
-		return -1 * mean_squared_error(pred, Y)
+		return -1 * getMeanSquaredError(pred, Y)
 
 	
 	def getAccuracy(self, X,Y,pred=None):
@@ -230,7 +377,7 @@ class Individual:
 		else:
 			pred = self.predict(X)
 
-		return accuracy_score(pred, Y)
+		return getAccuracyScore(pred, Y)
 
 
 	def getWaF(self, X, Y,pred=None):
@@ -244,7 +391,7 @@ class Individual:
 		else:
 			pred = self.predict(X)
 
-		return f1_score(pred, Y, average="weighted")
+		return getWaFScore(pred, Y)
 
 
 	def getKappa(self, X, Y,pred=None):
@@ -258,25 +405,42 @@ class Individual:
 		else:
 			pred = self.predict(X)
 
-		return cohen_kappa_score(pred, Y)
+		return getKappaScore(pred, Y)
+
+
+	def getClassificationMeasures(self, X, Y, pred=None):
+		'''
+		Returns the individual's accuracy, WAF and kappa value, computed from
+		a single confusion matrix.
+		'''
+		if pred == "Tr":
+			pred = self.getTrainingPredictions()
+		elif pred == "Te":
+			pred = self.getTestPredictions(X)
+		else:
+			pred = self.predict(X)
+
+		return getClassificationMeasures(pred, Y)
 
 
 
-	def calculate(self, X):
+	def calculate(self, X, dtype=None):
 		'''
-		Return the position of a sample in the output space.
+		Return the position of a sample in the output space, computed with the
+		individual's dtype (or "dtype").
 		'''
-		return self.head.calculate(X)
+		dtype = self.dtype if dtype is None else dtype
+		res = evaluate(self.getProgram(), X, dtype)
+		if np.ndim(res) == 0:
+			res = np.full(getNumberOfRows(X), res, dtype=dtype)
+		return res
 
 
 	def convert(self, X):
 		'''
-		Returns the converted input space.
+		Returns the converted input space: the individual's output for each sample.
 		'''
-		ret = pd.DataFrame()
-		a = self.head.calculate(X)
-		ret["#0"] = a
-		return ret
+		return self.calculate(X)
 
 
 	def predict(self, X):
@@ -297,6 +461,9 @@ class Individual:
 			state = str(d)
 			d.prun(self.training_X)
 			done = state == str(d)
+		self.program = None
+		self.size = 0
+		self.depth = 0
 
 
 
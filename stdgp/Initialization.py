@@ -0,0 +1,140 @@
+from .Node import Node, EphemeralRandomConstant
+
+import numpy as np
+
+#
+# By using this file, you are agreeing to this product's EULA
+#
+# This product can be obtained in https://github.com/jespb/Python-StdGP
+#
+# Copyright ©2019-2022 J. E. Batista
+#
+
+class PopulationEncoding:
+	'''
+	Compact array encoding of a whole population of trees.
+
+	The trees are generated level by level, with one vectorized random draw per
+	level for the entire population. Each node is stored as a code (operator
+	index if >= 0, terminal index -(code+1) otherwise) and the index of its
+	first child; the children of a node are stored contiguously. The first
+	"n" nodes are the roots of the trees.
+
+	Terminals that are EphemeralRandomConstants get their values in the same
+	draws, stored in "constants". Node objects are only built when a tree is
+	decoded.
+	'''
+
+	operators = None
+	terminals = None
+
+	codes = None
+	first_child = None
+	constants = None
+	sizes = None
+	depths = None
+
+	def __init__(self, rng, n, operators, terminals, max_depth, method="grow", min_depth=2):
+		'''
+		Generates "n" trees using numpy's random Generator "rng".
+
+		Methods:
+		"grow"   - every tree has the depth limit max_depth; the root is an operator
+		           and every other node is an operator with probability 0.5
+		"ramped" - ramped half-and-half; the depth limits are spread from
+		           min_depth to max_depth, half of the trees are full and half use grow
+		'''
+		self.operators = operators
+		self.terminals = terminals
+
+		arities = np.array([n_args for op, n_args in operators])
+		lows = np.array([t.low if isinstance(t, EphemeralRandomConstant) else np.nan for t in terminals], dtype=np.float64)
+		highs = np.array([t.high if isinstance(t, EphemeralRandomConstant) else np.nan for t in terminals], dtype=np.float64)
+
+		if method == "grow":
+			depth_left = np.full(n, max_depth)
+			full = np.zeros(n, dtype=bool)
+		elif method == "ramped":
+			min_depth = min(min_depth, max_depth)
+			indices = np.arange(n)
+			depth_left = min_depth + (indices//2) % (max_depth - min_depth + 1)
+			full = indices % 2 == 0
+		else:
+			raise Exception("Unknown initialization method: "+str(method))
+
+		codes = []
+		first_child = []
+		constants = []
+		parents = []
+		is_root = np.ones(n, dtype=bool)
+		parent = np.full(n, -1)
+
+		start = 0
+		while len(depth_left) > 0:
+			k = len(depth_left)
+			is_op = (depth_left > 1) & (is_root | full | (rng.random(k) < 0.5))
+			ops = rng.integers(len(operators), size=k)
+			terms = rng.integers(len(terminals), size=k)
+			constants.append( lows[terms] + rng.random(k) * (highs[terms] - lows[terms]) )
+
+			n_children = np.where(is_op, arities[ops], 0)
+			end = start + k
+
+			codes.append( np.where(is_op, ops, -terms-1).astype(np.int32) )
+			first_child.append( end + np.cumsum(n_children) - n_children )
+			parents.append( parent )
+
+			parent = np.repeat(np.arange(start, end), n_children)
+			depth_left = np.repeat(depth_left - 1, n_children)
+			full = np.repeat(full, n_children)
+			is_root = np.zeros(len(depth_left), dtype=bool)
+			start = end
+
+		self.codes = np.concatenate(codes)
+		self.first_child = np.concatenate(first_child)
+		self.constants = np.concatenate(constants)
+
+		# Subtree sizes and depths, accumulated from the deepest level up
+		size = np.ones(start, dtype=np.int64)
+		depth = np.ones(start, dtype=np.int64)
+		offset = start
+		for level_parents in reversed(parents[1:]):
+			ids = np.arange(offset - len(level_parents), offset)
+			np.add.at(size, level_parents, size[ids])
+			np.maximum.at(depth, level_parents, depth[ids]+1)
+			offset -= len(level_parents)
+
+		self.sizes = size[:n]
+		self.depths = depth[:n]
+
+		self.codeList = None
+		self.firstChildList = None
+
+
+	def __len__(self):
+		return len(self.sizes)
+
+
+	def decode(self, index):
+		'''
+		Returns the tree with the given index as a Node.
+		'''
+		if self.codeList is None:
+			self.codeList = self.codes.tolist()
+			self.firstChildList = self.first_child.tolist()
+		return self.decodeNode(index)
+
+
+	def decodeNode(self, i):
+		n = Node()
+		code = self.codeList[i]
+		if code >= 0:
+			op, n_args = self.operators[code]
+			first = self.firstChildList[i]
+			n.copy(value=op, branches=[self.decodeNode(first+j) for j in range(n_args)])
+		else:
+			terminal = self.terminals[-code-1]
+			if isinstance(terminal, EphemeralRandomConstant):
+				terminal = float(self.constants[i])
+			n.copy(value=terminal)
+		return n
@@ -0,0 +1,122 @@
+from .Evaluator import TERMINAL, CONSTANT, calculateScalar, isDivisor
+
+import numpy as np
+
+#
+# By using this file, you are agreeing to this product's EULA
+#
+# This product can be obtained in https://github.com/jespb/Python-StdGP
+#
+# Copyright ©2019-2022 J. E. Batista
+#
+
+
+def getFeatureRanges(X, dtype=np.float64):
+	'''
+	Returns a dictionary with the minimum and maximum value of each feature of
+	X, in the evaluation precision. Features with missing or infinite values
+	are left out, so the outputs of the programs that use them are unknown.
+	'''
+	if hasattr(X, "getColumnRanges"):
+		lows, highs = X.getColumnRanges()
+	else:
+		lows = [np.min(np.asarray(X[name])) if len(X) else np.nan for name in X.columns]
+		highs = [np.max(np.asarray(X[name])) if len(X) else np.nan for name in X.columns]
+
+	ranges = {}
+	for name, low, high in zip(X.columns, lows, highs):
+		low, high = dtype(low), dtype(high)
+		if np.isfinite(low) and np.isfinite(high):
+			ranges[name] = (low, high)
+	return ranges
+
+
+def getOutputInterval(program, ranges, dtype=np.float64):
+	'''
+	Returns the bounds (low, high) of the outputs of a program (see
+	stdgp.Evaluator) on every sample whose features are within "ranges".
+	The bounds are computed with the same precision and rounding as the
+	evaluation, so they also bound the values that it computes. Returns None if
+	the outputs may be infinite or undefined.
+
+	Besides interval arithmetic, the subtraction and division of identical
+	subtrees are known to be 0 and 1 (e.g., X0 - X0).
+	'''
+	stack = []
+	for instruction in program:
+		kind = instruction[0]
+		if kind == TERMINAL:
+			if instruction[1] not in ranges:
+				return None
+			low, high = ranges[instruction[1]]
+			stack.append( (low, high, instruction) )
+		elif kind == CONSTANT:
+			value = dtype(instruction[1])
+			stack.append( (value, value, instruction) )
+		else:
+			op, n_args = instruction[1], instruction[2]
+			args = stack[-n_args:]
+			del stack[-n_args:]
+
+			bounds = getOperatorInterval(op, args, dtype)
+			if bounds is None or not (np.isfinite(bounds[0]) and np.isfinite(bounds[1])):
+				return None
+			stack.append( bounds + ( (op,) + tuple([a[2] for a in args]), ) )
+	return stack[0][0], stack[0][1]
+
+
+def getOperatorInterval(op, args, dtype=np.float64):
+	'''
+	Returns the bounds of an operator's result, given the bounds (low, high, subtree)
+	of its arguments, or None if they are unknown.
+	'''
+	if all( [a[0] == a[1] for a in args] ):
+		value = dtype(calculateScalar(op, [a[0] for a in args], dtype))
+		return value, value
+
+	a, b = args[0], args[-1]
+	if op == "+":
+		return a[0] + b[0], a[1] + b[1]
+	if op == "-":
+		if a[2] == b[2]:
+			return dtype(0), dtype(0)
+		return a[0] - b[1], a[1] - b[0]
+	if op == "*":
+		products = [a[0]*b[0], a[0]*b[1], a[1]*b[0], a[1]*b[1]]
+		return min(products), max(products)
+	if op == "/":
+		# Protected division: X / 0 == X
+		if isNeverDivisor(b, dtype):
+			return a[0], a[1]
+		if not isAlwaysDivisor(b, dtype):
+			return None
+		if a[2] == b[2]:
+			return dtype(1), dtype(1)
+		quotients = [a[0]/b[0], a[0]/b[1], a[1]/b[0], a[1]/b[1]]
+		return min(quotients), max(quotients)
+	if op == "log2":
+		# Protected logarithm: log2(X) == X if X <= 0
+		if a[1] <= 0:
+			return a[0], a[1]
+		if a[0] > 0:
+			return dtype(np.log2(a[0])), dtype(np.log2(a[1]))
+		smallest = dtype(np.log2(np.finfo(dtype).smallest_subnormal))
+		return min(a[0], smallest), max(dtype(0), dtype(np.log2(a[1])))
+	if op == "max":
+		return max( [a[0] for a in args] ), max( [a[1] for a in args] )
+	raise Exception("Unknown operator: "+str(op))
+
+
+def isAlwaysDivisor(bounds, dtype=np.float64):
+	'''
+	Returns True if the protected division uses every value within the bounds
+	as a divisor.
+	'''
+	return (bounds[0] > 0 or bounds[1] < 0) and isDivisor(bounds[0], dtype) and isDivisor(bounds[1], dtype)
+
+
+def isNeverDivisor(bounds, dtype=np.float64):
+	'''
+	Returns True if the protected division treats every value within the bounds as 0.
+	'''
+	return not isDivisor(bounds[0], dtype) and not isDivisor(bounds[1], dtype)
@@ -0,0 +1,97 @@
+import multiprocessing as mp
+
+#
+# By using this file, you are agreeing to this product's EULA
+#
+# This product can be obtained in https://github.com/jespb/Python-StdGP
+#
+# Copyright ©2019-2022 J. E. Batista
+#
+
+
+def getIslandSizes(population_size, n_islands):
+	'''
+	Splits the population size among the islands.
+	'''
+	return [population_size//n_islands + (1 if i < population_size%n_islands else 0) for i in range(n_islands)]
+
+
+def getMigrationTargets(rng, n_islands, topology="ring"):
+	'''
+	Returns the island that receives the migrants of each island:
+	"ring"   - island i sends its migrants to island i+1
+	"random" - each island sends its migrants to another island, chosen at random
+	'''
+	if topology == "ring":
+		return [(i+1) % n_islands for i in range(n_islands)]
+	if topology == "random":
+		return [(i + rng.randint(1, n_islands-1)) % n_islands for i in range(n_islands)]
+	raise Exception("Unknown migration topology: "+str(topology))
+
+
+class IslandProcess:
+	'''
+	Process that evolves one island: a StdGP model that runs its own selection,
+	variation and evaluation. The island receives the datasets when the process
+	starts and only exchanges migrants, statistics and trees afterwards. The
+	trees (Node objects) are sent instead of their expressions, which cannot be
+	parsed back when the feature names have spaces or parentheses.
+	'''
+	process = None
+	connection = None
+
+	def __init__(self, model, Tr_x, Tr_y, Te_x, Te_y):
+		self.connection, child = mp.Pipe()
+		self.process = mp.Process(target=runIsland, args=(child, model, Tr_x, Tr_y, Te_x, Te_y), daemon=True)
+		self.process.start()
+
+	def evolve(self, generations, immigrants, n_emigrants):
+		'''
+		Asks the island to receive the immigrants and run the given number of
+		generations. The results are read with getResults.
+		'''
+		self.connection.send( (generations, immigrants, n_emigrants) )
+
+	def getResults(self):
+		'''
+		Returns the fitness and size of the island's best individual in each
+		generation, a copy of its tree, the emigrants and the island's statistics
+		of those generations.
+		'''
+		return self.connection.recv()
+
+	def close(self):
+		'''
+		Stops the island and returns its population, as trees.
+		'''
+		population = None
+		if self.process.is_alive():
+			self.connection.send(None)
+			population = self.connection.recv()
+		self.process.join()
+		return population
+
+
+def runIsland(connection, model, Tr_x, Tr_y, Te_x, Te_y):
+	model.initialize(Tr_x, Tr_y, Te_x, Te_y)
+
+	while True:
+		task = connection.recv()
+		if task is None:
+			connection.send( [ind.getHead() for ind in model.population] )
+			break
+
+		generations, immigrants, n_emigrants = task
+		model.addImmigrants(immigrants)
+
+		start = model.currentGeneration
+		curve = []
+		for g in range(generations):
+			model.evolve(1)
+			curve.append( (model.bestIndividual.getFitness(), model.bestIndividual.getSize()) )
+
+		telemetry = None
+		if Te_x is not None:
+			telemetry = model.getTelemetry(start)
+
+		connection.send( (curve, model.bestIndividual.getHead(), model.getEmigrants(n_emigrants), telemetry) )
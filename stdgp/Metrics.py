@@ -0,0 +1,96 @@
+import numpy as np
+
+#
+# By using this file, you are agreeing to this product's EULA
+#
+# This product can be obtained in https://github.com/jespb/Python-StdGP
+#
+# Copyright ©2019-2022 J. E. Batista
+#
+
+
+def getConfusionMatrix(pred, Y):
+	'''
+	Returns the confusion matrix of two label vectors. The rows follow the
+	labels in "pred" and the columns the labels in "Y", the argument order
+	used by stdgp.Individual (as in sklearn's metrics with y_true=pred).
+	'''
+	pred = np.asarray(pred)
+	Y = np.asarray(Y)
+
+	labels, inverse = np.unique(np.concatenate([pred, Y]), return_inverse=True)
+	n = len(pred)
+	k = len(labels)
+
+	cm = np.bincount(inverse[:n]*k + inverse[n:], minlength=k*k)
+	return cm.reshape(k,k)
+
+
+def getAccuracyFromConfusionMatrix(cm):
+	'''
+	Returns the accuracy described by a confusion matrix.
+	'''
+	return np.trace(cm) / cm.sum()
+
+
+def getWaFFromConfusionMatrix(cm):
+	'''
+	Returns the weighted F1 score described by a confusion matrix, using the
+	row totals as the class support.
+	'''
+	tp = np.diag(cm)
+	support = cm.sum(axis=1)
+	denominator = support + cm.sum(axis=0)
+
+	f1 = np.divide(2*tp, denominator, out=np.zeros(len(tp)), where=denominator>0)
+	return np.sum(f1*support) / support.sum()
+
+
+def getKappaFromConfusionMatrix(cm):
+	'''
+	Returns the Cohen's kappa value described by a confusion matrix.
+	'''
+	total = cm.sum()
+	expected = np.outer(cm.sum(axis=1), cm.sum(axis=0)) / total
+
+	observed_disagreement = total - np.trace(cm)
+	expected_disagreement = total - np.trace(expected)
+
+	return 1 - np.float64(observed_disagreement) / expected_disagreement
+
+
+def getClassificationMeasures(pred, Y):
+	'''
+	Returns the accuracy, weighted F1 score and kappa value of a set of
+	predictions, all derived from a single confusion matrix.
+	'''
+	cm = getConfusionMatrix(pred, Y)
+	return getAccuracyFromConfusionMatrix(cm), getWaFFromConfusionMatrix(cm), getKappaFromConfusionMatrix(cm)
+
+
+def getAccuracyScore(pred, Y):
+	'''
+	Returns the fraction of predictions equal to the labels.
+	'''
+	return float(np.mean(np.asarray(pred) == np.asarray(Y)))
+
+
+def getWaFScore(pred, Y):
+	'''
+	Returns the weighted F1 score of a set of predictions.
+	'''
+	return float(getWaFFromConfusionMatrix(getConfusionMatrix(pred, Y)))
+
+
+def getKappaScore(pred, Y):
+	'''
+	Returns the Cohen's kappa value of a set of predictions.
+	'''
+	return float(getKappaFromConfusionMatrix(getConfusionMatrix(pred, Y)))
+
+
+def getMeanSquaredError(pred, Y):
+	'''
+	Returns the mean squared error of a set of predictions.
+	'''
+	return float(np.mean( (np.asarray(pred, dtype=np.float64) - np.asarray(Y, dtype=np.float64))**2 ))
@@ -0,0 +1,226 @@
+from .Evaluator import TERMINAL, CONSTANT, OPERATOR, evaluate, getNumberOfRows
+
+import numpy as np
+import json
+import struct
+
+#
+# By using this file, you are agreeing to this product's EULA
+#
+# This product can be obtained in https://github.com/jespb/Python-StdGP
+#
+# Copyright ©2019-2022 J. E. Batista
+#
+
+# Version of the files written by CompiledModel.save
+MODEL_VERSION = 1
+
+# First bytes of the binary files
+BINARY_MAGIC = b"STDGPMDL"
+
+
+class CompiledModel:
+	'''
+	Trained model ready to be evaluated: the compiled program of an individual
+	(see stdgp.Evaluator), the names of the features, the threshold of its
+	classifier, the evaluation precision and a metadata dictionary.
+
+	Models are saved in a JSON or a binary file (see save) and loaded with
+	loadModel, without building Node objects or reading the training data.
+	'''
+
+	program = None
+	terminals = None
+	threshold = None
+	dtype = None
+	metadata = None
+
+	def __init__(self, program, terminals, threshold, dtype=np.float64, metadata=None):
+		self.program = program
+		self.terminals = list(terminals)
+		self.threshold = threshold
+		self.dtype = np.dtype(dtype).type
+		self.metadata = {} if metadata is None else metadata
+
+	def __str__(self):
+		return self.metadata.get("expression", "CompiledModel")
+
+	@classmethod
+	def fromIndividual(cls, individual, terminals, metadata=None):
+		'''
+		Returns the compiled model of a trained Individual. "terminals" are the
+		names of the features.
+		'''
+		info = {"expression": str(individual), "size": individual.getSize(),
+			"depth": individual.getDepth(), "fitness": float(individual.getFitness()),
+			"fitnessType": individual.fitnessType, "model_name": individual.model_name}
+		if metadata is not None:
+			info.update(metadata)
+		return cls(individual.getProgram(), terminals, float(individual.model.threshold), individual.dtype, info)
+
+
+	def calculate(self, X):
+		'''
+		Returns the model's output for each sample of X (a DataFrame or a
+		dictionary from feature names to NumPy arrays).
+		'''
+		sample = dict( [(name, np.asarray(X[name], dtype=self.dtype)) for name in self.getFeatures()] )
+		res = evaluate(self.program, sample, self.dtype)
+		if np.ndim(res) == 0:
+			res = np.full(getNumberOfRows(X), res, dtype=self.dtype)
+		return res
+
+	def predict(self, X):
+		'''
+		Returns the class prediction of each sample of X.
+		'''
+		return (self.calculate(X) > self.threshold).astype(np.uint8)
+
+	def getFeatures(self):
+		'''
+		Returns the names of the features used by the program.
+		'''
+		used = set( [instruction[1] for instruction in self.program if instruction[0] == TERMINAL] )
+		return [name for name in self.terminals if name in used]
+
+	def readFeatures(self, filename, cache=False, cache_dir=None, validation="mtime", has_class=False):
+		'''
+		Returns a dictionary with the features used by the program, read from a
+		CSV file. Only those columns are parsed (pandas' usecols) or, with
+		cache=True, read from the dataset's binary cache (see stdgp.DatasetCache),
+		which treats the last column as the class only if has_class=True.
+		A program without features reads the first feature, for the number of rows.
+		'''
+		columns = self.getFeatures() or self.terminals[:1]
+		if cache:
+			from .DatasetCache import openColumns
+			return openColumns(filename, columns, cache_dir, validation, self.dtype, has_class)
+
+		import pandas
+		ds = pandas.read_csv(filename, usecols=columns, dtype=dict.fromkeys(columns, self.dtype))
+		return dict( [(name, ds[name].to_numpy()) for name in columns] )
+
+	def predictFile(self, filename, cache=False, cache_dir=None, validation="mtime", has_class=False):
+		'''
+		Returns the class predictions for the samples of a CSV file, reading only
+		the features used by the program (see readFeatures).
+		'''
+		return self.predict(self.readFeatures(filename, cache, cache_dir, validation, has_class))
+
+
+	def toDict(self):
+		'''
+		Returns the model as a dictionary that can be written in JSON.
+		'''
+		return {"version": MODEL_VERSION, "program": [list(instruction) for instruction in self.program],
+			"terminals": self.terminals, "threshold": self.threshold,
+			"dtype": np.dtype(self.dtype).name, "metadata": self.metadata}
+
+	def toBytes(self):
+		'''
+		Returns the model in the binary format: the magic bytes, the length of a
+		JSON header (terminals, operators, threshold, precision and metadata),
+		the header and three arrays with one entry per instruction (kind, argument
+		and number of arguments). The argument of a terminal is its position in
+		the terminals, of an operator its position in the operators and of a
+		constant its position in the constants, stored as float64 at the end.
+		'''
+		positions = dict( [(name, i) for i, name in enumerate(self.terminals)] )
+		operators = []
+		constants = []
+		n = len(self.program)
+		kinds = np.zeros(n, dtype=np.uint8)
+		args = np.zeros(n, dtype=np.int32)
+		n_args = np.zeros(n, dtype=np.uint8)
+		for i, instruction in enumerate(self.program):
+			kinds[i] = instruction[0]
+			if instruction[0] == TERMINAL:
+				args[i] = positions[instruction[1]]
+			elif instruction[0] == CONSTANT:
+				args[i] = len(constants)
+				constants.append(instruction[1])
+			else:
+				if instruction[1] not in operators:
+					operators.append(instruction[1])
+				args[i] = operators.index(instruction[1])
+				n_args[i] = instruction[2]
+
+		header = json.dumps({"version": MODEL_VERSION, "terminals": self.terminals, "operators": operators,
+			"threshold": self.threshold, "dtype": np.dtype(self.dtype).name, "metadata": self.metadata,
+			"instructions": n, "constants": len(constants)}).encode("utf-8")
+		return b"".join([BINARY_MAGIC, struct.pack("<I", len(header)), header,
+			kinds.tobytes(), args.astype("<i4").tobytes(), n_args.tobytes(),
+			np.asarray(constants, dtype="<f8").tobytes()])
+
+	def save(self, filename, format="json"):
+		'''
+		Saves the model to a "json" or "binary" file.
+		'''
+		if format == "json":
+			with open(filename, "w") as f:
+				json.dump(self.toDict(), f)
+		elif format == "binary":
+			with open(filename, "wb") as f:
+				f.write(self.toBytes())
+		else:
+			raise Exception("Unknown model format: "+str(format))
+
+
+	@classmethod
+	def fromDict(cls, model):
+		'''
+		Returns the model described by a dictionary written by toDict.
+		'''
+		if model.get("version") != MODEL_VERSION:
+			raise Exception("Unsupported model version: "+str(model.get("version")))
+		program = []
+		for instruction in model["program"]:
+			if instruction[0] == CONSTANT:
+				program.append( (CONSTANT, float(instruction[1])) )
+			else:
+				program.append( tuple(instruction) )
+		return cls(program, model["terminals"], model["threshold"], model["dtype"], model["metadata"])
+
+	@classmethod
+	def fromBytes(cls, data):
+		'''
+		Returns the model described by the bytes written by toBytes.
+		'''
+		if data[:len(BINARY_MAGIC)] != BINARY_MAGIC:
+			raise Exception("Not a binary StdGP model.")
+		start = len(BINARY_MAGIC)
+		length = struct.unpack("<I", data[start:start+4])[0]
+		start += 4
+		header = json.loads(data[start:start+length].decode("utf-8"))
+		if header.get("version") != MODEL_VERSION:
+			raise Exception("Unsupported model version: "+str(header.get("version")))
+		start += length
+
+		n = header["instructions"]
+		kinds = np.frombuffer(data, dtype=np.uint8, count=n, offset=start)
+		args = np.frombuffer(data, dtype="<i4", count=n, offset=start+n)
+		n_args = np.frombuffer(data, dtype=np.uint8, count=n, offset=start+5*n)
+		constants = np.frombuffer(data, dtype="<f8", count=header["constants"], offset=start+6*n)
+
+		terminals = header["terminals"]
+		operators = header["operators"]
+		program = []
+		for kind, arg, n_arg in zip(kinds.tolist(), args.tolist(), n_args.tolist()):
+			if kind == TERMINAL:
+				program.append( (TERMINAL, terminals[arg]) )
+			elif kind == CONSTANT:
+				program.append( (CONSTANT, float(constants[arg])) )
+			else:
+				program.append( (OPERATOR, operators[arg], n_arg) )
+		return cls(program, terminals, header["threshold"], header["dtype"], header["metadata"])
+
+
+def loadModel(filename):
+	'''
+	Returns the CompiledModel saved in a JSON or binary file.
+	'''
+	with open(filename, "rb") as f:
+		data = f.read()
+	if data[:len(BINARY_MAGIC)] == BINARY_MAGIC:
+		return CompiledModel.fromBytes(data)
+	return CompiledModel.fromDict(json.loads(data.decode("utf-8")))
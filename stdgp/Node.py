@@ -1,6 +1,7 @@
 import numpy as np
 
 from math import log
+from .Evaluator import compileNode, evaluate
 
 import warnings
 warnings.filterwarnings("ignore")
@@ -13,6 +14,28 @@ warnings.filterwarnings("ignore")
 # Copyright ©2019-2022 J. E. Batista
 #
 
+class EphemeralRandomConstant:
+	'''
+	Terminal that becomes a new random constant, drawn uniformly from
+	[low, high], every time it is chosen for a new Node.
+	'''
+	low = None
+	high = None
+
+	def __init__(self, low=-1.0, high=1.0):
+		self.low = low
+		self.high = high
+
+	def __str__(self):
+		return "ERC[%s,%s]" % (self.low, self.high)
+
+	def __repr__(self):
+		return str(self)
+
+	def draw(self, rng):
+		return float(rng.uniform(self.low, self.high))
+
+
 class Node:
 	branches = None
 	value = None
@@ -33,7 +56,9 @@ class Node:
 				n.create(rng, operators, terminals, depth-1)
 				self.branches.append(n)
 		else:
-			self.value = terminals[rng.randint(0,len(terminals)-1)] # Sem literais
+			self.value = terminals[rng.randint(0,len(terminals)-1)]
+			if isinstance(self.value, EphemeralRandomConstant):
+				self.value = self.value.draw(rng)
 
 
 	def copy(self,value=None, branches=None):
@@ -121,36 +146,9 @@ class Node:
 
 	def calculate(self, sample):
 		'''
-		Returns the calculated value of a sample.
+		Returns the calculated value of a sample. Constant subtrees return scalars.
 		'''
-		if self.branches == None:
-			try:
-				return np.array( sample[self.value] )#.astype("float64")
-			except:
-				return np.array( [float(self.value)]*sample.shape[0] )
-
-				
-		else:
-			if self.value == "+": #+
-				return self.branches[0].calculate(sample) + self.branches[1].calculate(sample)
-			if self.value == "-": #-
-				return self.branches[0].calculate(sample) - self.branches[1].calculate(sample)
-			if self.value == "*": #*
-				return self.branches[0].calculate(sample) * self.branches[1].calculate(sample)
-			if self.value == "/": #/
-				right = self.branches[1].calculate(sample)
-				right = np.where(right==0, 1, right)
-				return self.branches[0].calculate(sample) / right
-			if self.value == "log2": # log2(X)
-				res = self.branches[0].calculate(sample)
-				res = np.where(res<=0, res, np.log2(res))
-				return res
-			if self.value == "max": # max( X0, X1, ... Xn)
-				calc = [b.calculate(sample) for b in self.branches]
-				a = []
-				for i in range(len(calc[0])):
-					a.append( max([calc[k][i] for k in range(len(calc))]) )
-				return np.array(a)
+		return evaluate(compileNode(self), sample)
 				
 
 	def isLeaf(self):
@@ -159,6 +157,33 @@ class Node:
 		'''
 		return self.branches == None
 
+	def isConstant(self):
+		'''
+		Returns True if the Node is a numeric constant.
+		'''
+		return self.branches == None and isinstance(self.value, float)
+
+	def isConstantValue(self, value):
+		'''
+		Returns True if the Node is the numeric constant "value".
+		'''
+		return self.isConstant() and self.value == value
+
+	def fold(self):
+		'''
+		Returns a copy of this Node in which every subtree without terminals is
+		replaced by its constant value.
+		'''
+		n = Node()
+		if self.branches == None:
+			n.copy(value=self.value)
+			return n
+
+		n.copy(value=self.value, branches=[b.fold() for b in self.branches])
+		if all( [b.isConstant() for b in n.branches] ):
+			n.copy(value=float(n.calculate(None)))
+		return n
+
 	def getSemantics(self,tr_x):
 		'''
 		Returns the semantic of a Node.
@@ -177,9 +202,11 @@ class Node:
 		Simplifies this Node
 		'''
 		semantics = self.getSemantics(tr_x)
-		semantics.sort()
-		if semantics[0]== semantics[-1] and len(semantics)>1:
-			self.value = str(semantics[0])
+		if np.ndim(semantics) == 0:
+			self.value = float(semantics)
+			self.branches = None
+		elif len(semantics)>1 and np.min(semantics) == np.max(semantics):
+			self.value = float(semantics[0])
 			self.branches = None
 
 
@@ -193,64 +220,64 @@ class Node:
 			# +
 			if self.value == "+":
 				# 0 + X == X
-				if not self.isLeaf() and ( self.branches[0].isLeaf() and self.branches[0].value == "0.0" ):
+				if not self.isLeaf() and ( self.branches[0].isConstantValue(0.0) ):
 					self.redirect(self.branches[1])
 
 				# X + 0 == X
-				if not self.isLeaf() and ( self.branches[1].isLeaf() and self.branches[1].value == "0.0" ):
+				if not self.isLeaf() and ( self.branches[1].isConstantValue(0.0) ):
 					self.redirect(self.branches[0])
 
 				# X + X == 2 * X
 				if not self.isLeaf() and ( str(self.branches[1]) == str(self.branches[0]) ):
 					self.value = "*"
 					n = Node()
-					n.copy(value = "2.0")
+					n.copy(value = 2.0)
 					self.branches[0].redirect( n )
 
 			# - 
 			if self.value == "-":
 				# X - 0 == X
-				if not self.isLeaf() and ( self.branches[1].isLeaf() and self.branches[1].value == "0.0" ):
+				if not self.isLeaf() and ( self.branches[1].isConstantValue(0.0) ):
 					self.redirect(self.branches[0])
 
 				# X - X == 0
 				if not self.isLeaf() and ( str(self.branches[1]) == str(self.branches[0]) ):
 					n = Node()
-					n.copy(value = "0.0")
+					n.copy(value = 0.0)
 					self.redirect( n )
 
 			# * 
 			if self.value == "*":
 				# X * 0 == 0,  0 * X == 0
-				if not self.isLeaf() and ( (self.branches[0].isLeaf() and self.branches[0].value=="0.0") or (self.branches[1].isLeaf() and self.branches[1].value=="0.0") ):
+				if not self.isLeaf() and ( (self.branches[0].isConstantValue(0.0)) or (self.branches[1].isConstantValue(0.0)) ):
 					n = Node()
-					n.copy(value = "0.0")
+					n.copy(value = 0.0)
 					self.redirect( n )
 
 				# 1 * X == X
-				if not self.isLeaf() and ( self.branches[0].isLeaf() and self.branches[0].value == "1.0" ):
+				if not self.isLeaf() and ( self.branches[0].isConstantValue(1.0) ):
 					self.redirect(self.branches[1])
 
 				# X * 1 == X
-				if not self.isLeaf() and ( self.branches[1].isLeaf() and self.branches[1].value == "1.0" ):
+				if not self.isLeaf() and ( self.branches[1].isConstantValue(1.0) ):
 					self.redirect(self.branches[0])
 
 			# //
 			if self.value == "/":
 				# X // 0 == 1
-				if not self.isLeaf() and ( self.branches[1].isLeaf() and self.branches[1].value=="0.0" ):
+				if not self.isLeaf() and ( self.branches[1].isConstantValue(0.0) ):
 					n = Node()
-					n.copy(value = "1.0")
+					n.copy(value = 1.0)
 					self.redirect( n )
 
 				# X // 1 == X
-				if not self.isLeaf() and ( self.branches[1].isLeaf() and self.branches[1].value=="1.0" ):
+				if not self.isLeaf() and ( self.branches[1].isConstantValue(1.0) ):
 					self.redirect(self.branches[0])
 
 				# X // X == 1
 				if not self.isLeaf() and ( str(self.branches[1]) == str(self.branches[0]) ):
 					n = Node()
-					n.copy(value = "1.0")
+					n.copy(value = 1.0)
 					self.redirect( n )
 
 
@@ -262,4 +289,57 @@ class Node:
 
 		if self.branches != None:
 			for branch in self.branches:
-				branch.prun(tr_x)
\ No newline at end of file
+				branch.prun(tr_x)
+
+def parseExpression(expression, operators, terminals):
+	'''
+	Returns the Node described by an expression in the format used by
+	Node.__str__, e.g., "( X0 + log2 ( X1 ) )". Terminals are matched by name;
+	other leaves must be numeric constants. Tokens are separated by spaces, so
+	terminal names cannot contain spaces.
+	'''
+	arity = dict(operators)
+	names = dict( [(str(t), t) for t in terminals if not isinstance(t, EphemeralRandomConstant)] )
+	tokens = expression.split()
+	position = [0]
+
+	def next_token():
+		if position[0] >= len(tokens):
+			raise Exception("Unexpected end of expression: "+expression)
+		token = tokens[position[0]]
+		position[0] += 1
+		return token
+
+	def expect(token):
+		if next_token() != token:
+			raise Exception("Expected '"+token+"' in expression: "+expression)
+
+	def parse():
+		token = next_token()
+		n = Node()
+		if token == "(":
+			left = parse()
+			op = next_token()
+			right = parse()
+			expect(")")
+			n.copy(value=op, branches=[left, right])
+		elif position[0] < len(tokens) and tokens[position[0]] == "(" and token in arity:
+			expect("(")
+			branches = []
+			while tokens[position[0]] != ")":
+				branches.append(parse())
+			expect(")")
+			n.copy(value=token, branches=branches)
+		elif token in names:
+			n.copy(value=names[token])
+		else:
+			try:
+				n.copy(value=float(token))
+			except ValueError:
+				raise Exception("Unknown terminal '"+token+"' in expression: "+expression)
+		return n
+
+	node = parse()
+	if position[0] != len(tokens):
+		raise Exception("Unexpected tokens at the end of expression: "+expression)
+	return node
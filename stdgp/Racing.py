@@ -0,0 +1,93 @@
+from .Evaluator import TERMINAL
+
+import numpy as np
+
+from math import log, sqrt
+
+#
+# By using this file, you are agreeing to this product's EULA
+#
+# This product can be obtained in https://github.com/jespb/Python-StdGP
+#
+# Copyright ©2019-2022 J. E. Batista
+#
+
+
+def getRacingBlocks(n_rows, block_size):
+	'''
+	Returns the (start, end) positions of row blocks whose size doubles from
+	"block_size" until all the rows are covered.
+	'''
+	blocks = []
+	start = 0
+	size = max(1, block_size)
+	while start < n_rows:
+		end = min(n_rows, start + size)
+		blocks.append( (start, end) )
+		start = end
+		size *= 2
+	return blocks
+
+
+def getRacingFitness(correct, seen, n_rows, target, delta):
+	'''
+	Returns the fitness of an individual stopped after "seen" rows: the lower
+	confidence bound of its accuracy (never below the accuracy it has if all
+	the remaining rows are wrong), capped just below "target". Stopped
+	individuals therefore rank below the individuals that reach the target.
+	'''
+	lower = max(correct/n_rows, correct/seen - sqrt(log(1/delta)/(2*seen)))
+	return min(lower, np.nextafter(target, -np.inf))
+
+
+def rankBelowEvaluated(stopped, evaluated):
+	'''
+	Caps the fitness of the "stopped" individuals just below the lowest fitness
+	of the "evaluated" individuals (scored on every row), so that an estimated
+	fitness never ranks above a full evaluation in the sorting, the tournaments
+	or the elite. Individuals rejected without evaluation (-inf) are ignored.
+	'''
+	fitness = [ind.getFitness() for ind in evaluated if np.isfinite(ind.getFitness())]
+	if len(fitness) == 0:
+		return
+	cap = np.nextafter(min(fitness), -np.inf)
+	for ind in stopped:
+		ind.fitness = min(ind.fitness, cap)
+
+
+def raceIndividual(ind, X, Y, order, blocks, target, delta):
+	'''
+	Scores an individual's accuracy on growing blocks of rows and stops as soon
+	as the Hoeffding bound shows, with confidence 1-delta, that its accuracy on
+	the whole training set is below "target".
+
+	The rows are visited in the order "order" (a random permutation of the rows
+	of X) and Y are the labels in that order. Each block only gathers the
+	features used by the individual. Truncated individuals get a conservative
+	fitness (see getRacingFitness) and have no stored training predictions.
+	Only valid for models that do not need to be fitted (e.g., a fixed threshold).
+
+	Returns the number of rows that were not evaluated.
+	'''
+	n_rows = len(Y)
+	ind.model = ind.createModel()
+	columns = set( [instruction[1] for instruction in ind.getProgram() if instruction[0] == TERMINAL] )
+	columns = dict( [(name, np.asarray(X[name])) for name in columns] )
+
+	predictions = np.empty(n_rows, dtype=np.uint8)
+	correct = 0
+	for start, end in blocks:
+		rows = order[start:end]
+		block = dict( [(name, column[rows]) for name, column in columns.items()] )
+		pred = ind.model.predict( ind.calculate(block) if block else ind.calculate(X.iloc[rows]) )
+		predictions[start:end] = pred
+		correct += np.sum(pred == Y[start:end])
+
+		if end < n_rows and correct/end + sqrt(log(1/delta)/(2*end)) < target:
+			ind.fitness = getRacingFitness(correct, end, n_rows, target, delta)
+			return n_rows - end
+
+	ind.trainingPredictions = np.empty(n_rows, dtype=np.uint8)
+	ind.trainingPredictions[order] = predictions
+	ind.fitness = correct/n_rows
+	return 0
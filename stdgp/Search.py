@@ -0,0 +1,252 @@
+from .StdGP import StdGP
+from .SparseData import toDataset
+
+import multiprocessing as mp
+import itertools
+import math
+import time
+
+#
+# By using this file, you are agreeing to this product's EULA
+#
+# This product can be obtained in https://github.com/jespb/Python-StdGP
+#
+# Copyright ©2019-2022 J. E. Batista
+#
+
+
+class HyperparameterSearch:
+	'''
+	Runs several StdGP configurations concurrently, in a pool of worker processes
+	that receive the dataset once, and ranks them by their validation score.
+
+	The configurations are run in rounds. Between rounds, each configuration's
+	state (see StdGP.getState) is kept and used to continue its evolution in the
+	next round, so no generation is repeated.
+
+	Methods:
+	"grid"    - every configuration runs for max_generation generations, in rounds
+	            of min_generations generations
+	"halving" - successive halving; after each round, only the best 1/eta of the
+	            configurations continue, and the next round runs until eta times
+	            as many generations
+
+	With "patience", a configuration whose validation score did not improve in the
+	last "patience" generations is stopped early.
+	'''
+
+	grid = None
+	method = None
+	params = None
+	threads = None
+	min_generations = None
+	eta = None
+	patience = None
+	verbose = None
+
+	configurations = None
+	leaderboard = None
+
+
+	def __init__(self, grid, method="halving", params=None, threads=1, min_generations=5, eta=2, patience=None, verbose=True):
+		'''
+		grid   - dictionary from StdGP argument names to lists of values; every
+		         combination is a configuration
+		params - StdGP arguments shared by every configuration. Their max_generation
+		         is the maximum number of generations of each configuration
+		'''
+		if method not in ["grid", "halving"]:
+			raise Exception("Unknown search method: "+str(method))
+
+		self.grid = grid
+		self.method = method
+		self.params = {} if params is None else dict(params)
+		self.threads = max(1, threads)
+		self.min_generations = max(1, min_generations)
+		self.eta = max(2, eta)
+		self.patience = patience
+		self.verbose = verbose
+
+
+	def getConfigurations(self):
+		'''
+		Returns the list of argument dictionaries given by the grid.
+		'''
+		names = sorted(self.grid)
+		return [ dict(zip(names, values)) for values in itertools.product(*[self.grid[name] for name in names]) ]
+
+
+	def fit(self, Tr_x, Tr_y, Va_x, Va_y):
+		'''
+		Runs the search. The configurations are trained on Tr_x and Tr_y and
+		ranked by their score (accuracy, or negative MSE with the MSE fitness) on
+		the validation set Va_x and Va_y.
+		'''
+		max_generation = self.params.get("max_generation", 25) # StdGP's default
+
+		self.configurations = []
+		for params in self.getConfigurations():
+			self.configurations.append( {"params": params, "state": None, "generations": 0,
+				"time": 0.0, "status": "running", "score": None, "fitness": None, "model": None} )
+
+		if self.threads > 1:
+			pool = mp.Pool(processes=self.threads, initializer=initSearchWorker,
+				initargs=(Tr_x, Tr_y, Va_x, Va_y))
+			mapper = pool.map
+		else:
+			initSearchWorker(Tr_x, Tr_y, Va_x, Va_y)
+			pool = None
+			mapper = map
+
+		try:
+			target = self.min_generations
+			active = list(self.configurations)
+			while active:
+				target = min(target, max_generation)
+
+				tasks = [ (i, self.getWorkerParams(c), c["state"], target - c["generations"])
+					for i, c in enumerate(active) ]
+				for i, state, duration, model in mapper(runConfigurationTask, tasks):
+					self.updateConfiguration(active[i], state, duration, model)
+
+				for c in active:
+					if self.isStagnated(c):
+						c["status"] = "stopped"
+				active = [c for c in active if c["status"] == "running"]
+
+				if self.verbose:
+					print("  > Search: %d generations, %d configurations running" % (target, len(active)))
+
+				if target >= max_generation:
+					for c in active:
+						c["status"] = "finished"
+					break
+
+				if self.method == "halving":
+					active.sort(key=lambda c: c["score"], reverse=True)
+					keep = max(1, math.ceil(len(active)/self.eta))
+					for c in active[keep:]:
+						c["status"] = "halved"
+					active = active[:keep]
+					target *= self.eta
+				else:
+					target += self.min_generations
+		finally:
+			if pool is not None:
+				pool.close()
+				pool.join()
+
+		# The configurations that survived the search come first
+		self.leaderboard = sorted(self.configurations, reverse=True,
+			key=lambda c: (c["status"] == "finished", c["generations"], c["score"]))
+
+
+	def getWorkerParams(self, configuration):
+		'''
+		Returns the StdGP arguments of a configuration. Each configuration runs in
+		a single process.
+		'''
+		params = dict(self.params)
+		params.update(configuration["params"])
+		params["threads"] = 1
+		params["backend"] = "serial"
+		params["verbose"] = False
+		return params
+
+
+	def updateConfiguration(self, configuration, state, duration, model):
+		configuration["state"] = state
+		configuration["generations"] = state["currentGeneration"]
+		configuration["time"] += duration
+		configuration["model"] = model
+
+		telemetry = state["telemetry"]
+		if self.params.get("fitnessType") == "MSE":
+			configuration["curve"] = telemetry["testMSEOverTime"]
+			configuration["fitness"] = float(telemetry["trainingMSEOverTime"][-1])
+		else:
+			configuration["curve"] = telemetry["testAccuracyOverTime"]
+			configuration["fitness"] = float(telemetry["trainingAccuracyOverTime"][-1])
+		configuration["score"] = float(configuration["curve"][-1])
+
+
+	def isStagnated(self, configuration):
+		'''
+		Returns True if the validation score of a configuration did not improve in
+		the last "patience" generations.
+		'''
+		curve = configuration["curve"]
+		if self.patience is None or len(curve) <= self.patience:
+			return False
+		return max(curve[-self.patience:]) <= max(curve[:-self.patience])
+
+
+	def getLeaderboard(self):
+		'''
+		Returns a list with the arguments, status ("finished", "halved" or "stopped"),
+		number of generations, training time, training score and validation score
+		of each configuration. The finished configurations come first, then the
+		others by number of generations; each group is sorted from the best to
+		the worst validation score.
+		'''
+		return [ {"params": c["params"], "status": c["status"], "generations": c["generations"],
+			"time": c["time"], "fitness": c["fitness"], "score": c["score"]} for c in self.leaderboard ]
+
+
+	def getBest(self, finished=True):
+		'''
+		Returns the best finished configuration. If no configuration finished (e.g.,
+		patience stopped all of them), an exception is raised or, if finished is
+		False, the first configuration of the leaderboard is returned.
+		'''
+		best = self.leaderboard[0]
+		if finished and best["status"] != "finished":
+			raise Exception("No configuration finished the search (the best was %s after %d generations). Use finished=False to get it." % (best["status"], best["generations"]))
+		return best
+
+	def getBestParams(self, finished=True):
+		'''
+		Returns the StdGP arguments of the best finished configuration (see getBest).
+		'''
+		params = dict(self.params)
+		params.update(self.getBest(finished)["params"])
+		return params
+
+
+	def getBestModel(self, finished=True):
+		'''
+		Returns the best individual of the best finished configuration (see getBest),
+		as an expression.
+		'''
+		return self.getBest(finished)["model"]
+
+
+
+# Training and validation sets of a worker process, set once by initSearchWorker
+searchData = None
+
+def initSearchWorker(Tr_x, Tr_y, Va_x, Va_y):
+	global searchData
+	searchData = (Tr_x, Tr_y, Va_x, Va_y)
+
+def runConfigurationTask(task):
+	'''
+	Continues the evolution of a configuration from its state for the given number
+	of generations. Returns the task's position, the new state, the time spent
+	and the best individual's expression.
+
+	Unlike fit, the best individual is only pruned after the state is saved, so
+	the configuration continues to evolve as in an uninterrupted fit.
+	'''
+	index, params, state, generations = task
+	Tr_x, Tr_y, Va_x, Va_y = searchData
+
+	t = time.time()
+	model = StdGP(**params)
+	model.initialize(toDataset(Tr_x), Tr_y, toDataset(Va_x), Va_y, state)
+	model.evolve(generations)
+	duration = time.time() - t
+
+	state = model.getState()
+	model.getBestIndividual().prun()
+	return index, state, duration, str(model.getBestIndividual())
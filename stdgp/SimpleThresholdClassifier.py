@@ -1,3 +1,5 @@
+import numpy as np
+
 
 # 
 # By using this file, you are agreeing to this product's EULA
@@ -7,25 +9,93 @@
 # Copyright ©2019-2022 J. E. Batista
 #
 
+# Threshold fitting used by each of the threshold classifiers that can be wrapped by the models
+THRESHOLD_FITTING = {"SimpleThresholdClassifier": None,
+	"AccuracyThresholdClassifier": "Accuracy",
+	"F1ThresholdClassifier": "F1"}
+
+
+def getOptimalThresholds(S, Y, fitting="Accuracy"):
+	"""
+	Receives S, a 2-D array with the outputs of several models (one row per
+	model) or a 1-D array with the outputs of a single model, and Y, the 0/1
+	labels. Returns, for each model, the threshold that maximizes the accuracy
+	or the F1 score of the rule "1 if v > threshold else 0".
+
+	All the models are handled in the same numpy calls: each row is sorted
+	once and every possible split is scored using cumulative class counts.
+
+	NaN (and -inf) outputs are always predicted as 0, so only the splits that
+	put them on the 0 side are scored.
+	"""
+	S = np.atleast_2d(np.asarray(S))
+	if S.dtype != np.float32:
+		S = S.astype(np.float64) # float32 outputs are sorted without a copy
+	S = np.where(np.isnan(S), -np.inf, S)
+	positive = np.asarray(Y) == 1
+	n_models, n = S.shape
+	total_positive = np.sum(positive)
+
+	order = np.argsort(S, axis=1, kind="stable")
+	values = np.take_along_axis(S, order, axis=1)
+
+	# k = number of rows (the k smallest values) predicted as 0, for k = 0..n
+	cum_positive = np.zeros((n_models, n+1), dtype=np.int64)
+	np.cumsum(positive[order], axis=1, out=cum_positive[:,1:])
+	k = np.arange(n+1)
+	true_negatives = k - cum_positive
+	true_positives = total_positive - cum_positive
+
+	if fitting == "F1":
+		score = 2*true_positives / np.maximum(1, (n - k) + total_positive)
+	else:
+		score = true_negatives + true_positives
+
+	# A split is only possible between two different values, after the rows that are always 0
+	valid = np.ones((n_models, n+1), dtype=bool)
+	valid[:,1:n] = values[:,:-1] < values[:,1:]
+	always_negative = np.sum(values == -np.inf, axis=1)
+	valid &= k >= always_negative[:,None]
+	score = np.where(valid, score, -1)
+
+	best = np.argmax(score, axis=1)
+	rows = np.arange(n_models)
+
+	# The threshold is set halfway between the last value predicted as 0 and the next one
+	below = values[rows, np.maximum(best-1, 0)]
+	above = values[rows, np.minimum(best, n-1)]
+	middle = below/2 + above/2
+	thresholds = np.where((middle > below) & (middle < above), middle, below)
+	thresholds = np.where(best == 0, np.nextafter(values[:,0], -np.inf), thresholds)
+	thresholds = np.where(best == n, values[:,-1], thresholds)
+	return thresholds
+
  
 class SimpleThresholdClassifier:
 
 	threshold = None
+	fitting = None
 
-	def __init__(self, threshold = 0):
+	def __init__(self, threshold = 0, fitting = None):
+		"""
+		fitting: None (fixed threshold), "Accuracy" or "F1" (threshold learned in fit)
+		"""
 		self.threshold = threshold
+		self.fitting = fitting
 
 	def fit(self,X=None,Y=None):
-		pass
+		if self.fitting is not None:
+			if hasattr(X, "iloc"):
+				X = X.iloc[:,0].to_numpy()
+			self.threshold = getOptimalThresholds(X, Y, self.fitting)[0]
 
 
 	def predict(self, X):	
 		"""
-		Receives X, a 1-D array of real values
-		Return a list of predictions based on the value
+		Receives X, a 1-D array of real values (or a DataFrame with one column)
+		Return a uint8 array of predictions based on the value (NaN values are 0)
 		"""	
-		predictions = []
-		for v in list(X.iloc[:,0]):
-			predictions.append( 1 if v > self.threshold else 0)
-		return predictions
-
+		if hasattr(X, "iloc"):
+			X = X.iloc[:,0].to_numpy()
+		X = np.asarray(X)
+		return ((X > self.threshold) & ~np.isnan(X)).astype(np.uint8)
@@ -0,0 +1,141 @@
+import numpy as np
+
+#
+# By using this file, you are agreeing to this product's EULA
+#
+# This product can be obtained in https://github.com/jespb/Python-StdGP
+#
+# Copyright ©2019-2022 J. E. Batista
+#
+
+
+def isSparse(X):
+	'''
+	Returns True if X is a SciPy sparse matrix (or array).
+	'''
+	return hasattr(X, "tocsc") and not isinstance(X, SparseDataset)
+
+
+def toDataset(X, feature_names=None):
+	'''
+	Returns X as a dataset that can be used by StdGP: SciPy sparse matrices are
+	wrapped in a SparseDataset; other datasets (e.g., DataFrames) are returned
+	as they are.
+	'''
+	if X is None or not isSparse(X):
+		return X
+	return SparseDataset(X, feature_names)
+
+
+class SparseDataset:
+	'''
+	Column adapter of a sparse feature matrix, stored in CSC format, used in
+	place of a DataFrame. The columns are converted to dense arrays only when a
+	model uses them, and kept in a cache until clearCache is called (StdGP
+	clears it in every generation). The memory used scales with the non-zero
+	values and with the features used by the population.
+	'''
+
+	matrix = None
+	columns = None
+	index = None
+	shape = None
+	cache = None
+
+	def __init__(self, matrix, columns=None, index=None):
+		self.matrix = matrix.tocsc()
+		self.matrix.sort_indices()
+		n_rows, n_columns = self.matrix.shape
+		if columns is None:
+			columns = ["X%d" % i for i in range(n_columns)]
+		if len(columns) != n_columns:
+			raise Exception("The sparse matrix has %d columns but %d feature names were given." % (n_columns, len(columns)))
+		self.columns = list(columns)
+		self.positions = dict( [(name, i) for i, name in enumerate(self.columns)] )
+		self.index = np.arange(n_rows) if index is None else np.asarray(index)
+		self.shape = self.matrix.shape
+		self.cache = {}
+
+	@property
+	def dtypes(self):
+		# Every column has the matrix's dtype
+		return [self.matrix.dtype]
+
+	@property
+	def iloc(self):
+		return SparseRowIndexer(self)
+
+	def __len__(self):
+		return self.shape[0]
+
+	def __getstate__(self):
+		state = self.__dict__.copy()
+		state["cache"] = {}
+		return state
+
+	def __getitem__(self, name):
+		'''
+		Returns the column "name" as a dense array.
+		'''
+		if name not in self.cache:
+			j = self.positions[name]
+			start, end = self.matrix.indptr[j], self.matrix.indptr[j+1]
+			column = np.zeros(self.shape[0], dtype=self.matrix.dtype)
+			column[self.matrix.indices[start:end]] = self.matrix.data[start:end]
+			self.cache[name] = column
+		return self.cache[name]
+
+	def clearCache(self):
+		'''
+		Releases the dense columns.
+		'''
+		self.cache = {}
+
+	def getCacheMemory(self):
+		'''
+		Returns the memory, in bytes, used by the dense columns in the cache.
+		'''
+		return sum( [column.nbytes for column in self.cache.values()] )
+
+	def getColumnRanges(self):
+		'''
+		Returns the minimum and maximum value of each column, computed from the
+		non-zero values (and 0, if the column has zeros).
+		'''
+		lows = np.zeros(self.shape[1], dtype=self.matrix.dtype)
+		highs = np.zeros(self.shape[1], dtype=self.matrix.dtype)
+		indptr, data = self.matrix.indptr, self.matrix.data
+		for j in range(self.shape[1]):
+			values = data[indptr[j]:indptr[j+1]]
+			if len(values) == 0:
+				continue
+			lows[j], highs[j] = np.min(values), np.max(values)
+			if len(values) < self.shape[0]:
+				lows[j], highs[j] = min(lows[j], 0), max(highs[j], 0)
+		return lows, highs
+
+	def astype(self, dtype):
+		return SparseDataset(self.matrix.astype(dtype), self.columns, self.index)
+
+	def concat(self, other):
+		'''
+		Returns a dataset with the rows of this dataset followed by the rows of "other".
+		'''
+		from scipy.sparse import vstack
+		other = toDataset(other, self.columns)
+		if other.columns != self.columns:
+			raise Exception("The datasets have different features.")
+		return SparseDataset(vstack([self.matrix, other.matrix]), self.columns,
+			np.concatenate([self.index, other.index]))
+
+
+class SparseRowIndexer:
+	'''
+	Selects rows by position, as DataFrame.iloc.
+	'''
+	def __init__(self, dataset):
+		self.dataset = dataset
+
+	def __getitem__(self, rows):
+		dataset = self.dataset
+		return SparseDataset(dataset.matrix[rows,:], dataset.columns, dataset.index[rows])
@@ -1,6 +1,22 @@
 from .Individual import Individual
-from .GeneticOperators import getElite, getOffspring, discardDeep, parsimony_tournament, double_tournament
-import multiprocessing as mp
+from .Node import Node, EphemeralRandomConstant, parseExpression
+from .Initialization import PopulationEncoding
+from .Racing import getRacingBlocks, raceIndividual, rankBelowEvaluated
+from .Folds import getStratifiedFolds, getContiguousFolds
+from .SimpleThresholdClassifier import THRESHOLD_FITTING, getOptimalThresholds
+from .Backends import createBackend, setEvaluationResult
+from .Evaluator import clearArenas
+from .Islands import IslandProcess, getIslandSizes, getMigrationTargets
+from .SparseData import SparseDataset, toDataset
+from .Model import CompiledModel
+from .Intervals import getFeatureRanges, getOutputInterval
+from .GeneticOperators import getElite, getOffspring, discardDeep, discardLarge, tarpeian, parsimony_tournament, double_tournament
+import numpy as np
+from collections import OrderedDict
+import copy
+import gzip
+import hashlib
+import pickle
 import time
 
 from random import Random
@@ -16,6 +32,22 @@ from random import Random
 import warnings
 warnings.filterwarnings("ignore")
 
+# Version of the files written by StdGP.saveState (version 1 stored expressions instead of trees)
+STATE_VERSION = 2
+
+# Per-generation statistics kept in the saved states
+TELEMETRY = ["trainingAccuracyOverTime", "testAccuracyOverTime", "trainingWaFOverTime", "testWaFOverTime",
+	"trainingKappaOverTime", "testKappaOverTime", "trainingMSEOverTime", "testMSEOverTime",
+	"sizeOverTime", "averageSizeOverTime", "sizeRejectionsOverTime", "generationTimes", 
+	"memoryOverTime", "rowsSavedOverTime"]
+
+# Maximum number of values (individuals x rows) in each batch of outputs used to fit the thresholds
+THRESHOLD_BATCH_SIZE = 2**24
+
+# Offspring created per individual of the population before the missing ones are
+# replaced by their parents (e.g., if the size limit rejects every offspring)
+OFFSPRING_ATTEMPTS = 10
+
 class ClassifierNotTrainedError(Exception):
     """ You tried to use the classifier before training it. """
 
@@ -31,25 +63,59 @@ class StdGP:
 	max_initial_depth = None
 	population_size = None
 	threads = None
+	backend = None
 	random_state = 42
 	rng = None # random number generator
 
 	max_depth = None
+	max_size = None
+	bloat_control = None
+	tarpeian_rate = None
+	dynamic_size_ratio = None
 	max_generation = None
 	tournament_size = None
 	elitism_size = None
 
 	model_name = None 
 	fitnessType = None
+	n_folds = None
+	erc_range = None
 
 	verbose = None
 
+	initialization = None
+
+	racing = None
+	racing_block = None
+	racing_delta = None
+
+	prediction_storage = None
+
+	window_size = None
+	generations_per_batch = None
+
+	dtype = None
+	check_float64 = None
+
+	semantic_cache = None
+	semantic_decimals = None
+
+	interval_analysis = None
+
+	islands = None
+	migration_interval = None
+	migration_size = None
+	migration_topology = None
+
 
 	## FIT arguments
 	terminals = None
 
+	folds = None
+
 	population = None
 	currentGeneration = 0
+	lastGeneration = 0
 	bestIndividual: Individual = None
 
 	trainingAccuracyOverTime = None
@@ -61,7 +127,36 @@ class StdGP:
 	trainingMSEOverTime = None
 	testMSEOverTime = None
 	sizeOverTime = None
+	averageSizeOverTime = None
+	sizeRejectionsOverTime = None
 	generationTimes = None
+	memoryOverTime = None
+	rowsSavedOverTime = None
+	workerTimesOverTime = None
+	semanticHitsOverTime = None
+	degenerateOverTime = None
+	populationMemory = 0
+
+	reportedIndividual = None
+	reportedMeasures = None
+
+	evaluationBackend = None
+
+	racingOrder = None
+	racingY = None
+	racingBlocks = None
+	racingTarget = None
+	rowsSaved = 0
+
+	precisionCheck = None
+
+	semanticCache = None
+	semanticLookups = 0
+	semanticHits = 0
+
+	sizeLimit = None
+	averageSize = 0
+	sizeRejections = 0
 
 
 
@@ -73,7 +168,11 @@ class StdGP:
   #we changed the population_size from 500 to 100, and max_generation from 100 to 25 so we could run faster experiments
 	def __init__(self, operators=[("+",2),("-",2),("*",2),("/",2)], max_initial_depth = 6, population_size = 100, 
 		max_generation = 25, tournament_size = 5, elitism_size = 1, max_depth = 17, Sf=8, Sp=3, Switch=False, 
-		threads=1, random_state = 42, verbose = True, model_name="SimpleThresholdClassifier", fitnessType="Accuracy"):
+		threads=1, random_state = 42, verbose = True, model_name="SimpleThresholdClassifier", fitnessType="Accuracy",
+		prediction_storage="uint8", initialization="node", racing=None, racing_block=1000, racing_delta=0.05, n_folds=5, erc_range=None, backend=None,
+		max_size=None, bloat_control=None, tarpeian_rate=0.3, dynamic_size_ratio=1.5, window_size=10000, generations_per_batch=1,
+		islands=1, migration_interval=10, migration_size=1, migration_topology="ring", dtype="float64", check_float64=False,
+		semantic_cache=0, semantic_decimals=None, interval_analysis=False):
 
 		if sum( [0 if op in [("+",2),("-",2),("*",2),("/",2)] else 0 for op in operators ] ) > 0:
 			print( "[Warning] Some of the following operators may not be supported:", operators)
@@ -83,10 +182,28 @@ class StdGP:
 		self.max_initial_depth = max_initial_depth
 		self.population_size = population_size
 		self.threads = max(1, threads)
+
+		# Population evaluation: "serial", "thread" (thread pool) or "process" (process pool).
+		# By default, the process pool is used if more than one thread is requested
+		if backend is None:
+			backend = "serial" if self.threads == 1 else "process"
+		self.backend = backend
 		self.random_state = random_state
 		self.rng = Random(random_state)
 
 		self.max_depth = max_depth
+
+		# Bloat control, applied before the offspring are evaluated:
+		# max_size - offspring with more nodes are discarded (None: no limit)
+		# bloat_control - None, "tarpeian" (larger than average offspring get the worst fitness 
+		#   with probability tarpeian_rate) or "dynamic" (offspring larger than dynamic_size_ratio
+		#   times the best individual, or than the largest initial individual, are discarded)
+		if max_size is not None and max_size < 1:
+			raise Exception("max_size must be at least 1 (a single terminal): "+str(max_size))
+		self.max_size = max_size
+		self.bloat_control = bloat_control
+		self.tarpeian_rate = tarpeian_rate
+		self.dynamic_size_ratio = dynamic_size_ratio
 		self.max_generation = max_generation
 		self.tournament_size = tournament_size
 		self.elitism_size = elitism_size
@@ -99,9 +216,62 @@ class StdGP:
 
 		self.model_name = model_name
 		self.fitnessType = fitnessType
+		self.n_folds = n_folds # used by the KFOLD fitness
+
+		# (low, high): adds an ephemeral random constant, drawn from [low, high], to the terminals
+		self.erc_range = erc_range
 
 		self.verbose = verbose
 
+		# How the training predictions of the population are kept after scoring:
+		# "uint8" (one byte per row), "packed" (one bit per row) or "none" (recomputed if needed)
+		self.prediction_storage = prediction_storage
+
+		# Initial population: "node" (one tree at a time, using Node.create), or
+		# "grow" and "ramped" (ramped half-and-half), generated in bulk by PopulationEncoding
+		self.initialization = initialization
+
+		# Racing evaluation: None or "median". Offspring are scored on growing blocks
+		# of rows and stopped once they cannot reach the fitness of the median of the
+		# previous generation (with confidence 1-racing_delta)
+		if racing not in [None, "median"]:
+			raise Exception("Unsupported racing mode: "+str(racing)+". Use None or \"median\".")
+		self.racing = racing
+		self.racing_block = racing_block
+		self.racing_delta = racing_delta
+
+		# Incremental training (partial_fit): maximum number of rows in the training
+		# window (None: all the rows received) and generations run for each batch
+		self.window_size = window_size
+		self.generations_per_batch = generations_per_batch
+
+		# Precision of the evaluation, "float64" or "float32". With float32, the datasets
+		# are converted once and the outputs and thresholds are computed in float32.
+		# check_float64 compares the final model's training predictions with float64 ones
+		self.dtype = np.dtype(dtype).type
+		self.check_float64 = check_float64
+
+		# Semantic cache: the fitness, threshold and training predictions of up to 
+		# semantic_cache individuals (least recently used are discarded), indexed by 
+		# a hash of their outputs on the training set, or of the outputs rounded to
+		# semantic_decimals decimals. Individuals with the same outputs reuse them
+		self.semantic_cache = semantic_cache
+		self.semantic_decimals = semantic_decimals
+
+		# Interval analysis: the bounds of each new individual's outputs are computed
+		# from the features' ranges in the training set. Individuals whose outputs are
+		# constant (e.g., X0 - X0), or that predict the same class for every sample,
+		# are scored without being evaluated on the training set
+		self.interval_analysis = interval_analysis
+
+		# Island model: the population is split into "islands" sub-populations, each
+		# evolved in its own process. Every migration_interval generations, the 
+		# migration_size best individuals of each island replace the worst individuals
+		# of another island, following a "ring" or "random" topology
+		self.islands = max(1, islands)
+		self.migration_interval = migration_interval
+		self.migration_size = migration_size
+		self.migration_topology = migration_topology
 
 
 
@@ -156,12 +326,17 @@ class StdGP:
 
 		return [self.trainingMSEOverTime, self.testMSEOverTime]
 
-	def getSizeOverTime(self):
+	def getSizeOverTime(self, detailed=False):
 		'''
 		Returns the size and number of dimensions of the best model in each generation.
+		If detailed is True, also returns the average size of the evaluated population,
+		the number of offspring rejected by the bloat control and the duration of
+		each generation.
 		'''
 		self.checkIfTrained()
 
+		if detailed:
+			return [self.sizeOverTime, self.averageSizeOverTime, self.sizeRejectionsOverTime, self.generationTimes]
 		return self.sizeOverTime
 
 	def getGenerationTimes(self):
@@ -172,6 +347,42 @@ class StdGP:
 
 		return self.generationTimes
 
+	def getMemoryOverTime(self):
+		'''
+		Returns the estimated memory, in bytes, used by the evaluated population in each generation.
+		'''
+		self.checkIfTrained()
+
+		return self.memoryOverTime
+
+	def getRowsSavedOverTime(self):
+		'''
+		Returns the number of training rows that the racing evaluation did not need
+		to evaluate in each generation.
+		'''
+		self.checkIfTrained()
+
+		return self.rowsSavedOverTime
+
+	def getWorkerTimesOverTime(self):
+		'''
+		Returns, for each generation evaluated by a thread, process or socket 
+		backend, the busy and idle time of each worker.
+		'''
+		self.checkIfTrained()
+
+		return self.workerTimesOverTime
+
+	def getMemoryEstimate(self):
+		'''
+		Returns the estimated memory, in bytes, used by the current population,
+		excluding the shared training set.
+		'''
+		self.checkIfTrained()
+
+		return sum( [ind.getMemoryEstimate() for ind in self.population] )
+
+
 
 
 
@@ -180,8 +391,211 @@ class StdGP:
 
 
 
+	def getState(self):
+		'''
+		Returns the state needed to continue the evolution: the population and
+		the best individual (as copies of their trees), the random number generator
+		state, the generation counter and the per-generation statistics.
+		'''
+		self.checkIfTrained()
+
+		return {"version": STATE_VERSION,
+				"population": [ind.getHead() for ind in self.population],
+				"bestIndividual": self.bestIndividual.getHead(),
+				"rng": self.rng.getstate(),
+				"currentGeneration": self.currentGeneration,
+				"telemetry": dict( [(name, getattr(self, name)) for name in TELEMETRY] )}
+
+	def saveState(self, filename):
+		'''
+		Saves the state returned by getState to a compressed file, which can be 
+		used to continue the evolution with fit(..., warm_start=filename).
+		'''
+		with gzip.open(filename, "wb") as f:
+			pickle.dump(self.getState(), f)
+
+	def exportModel(self, filename=None, format="json", metadata=None):
+		'''
+		Returns the final model as a CompiledModel (see stdgp.Model) and, if
+		"filename" is given, saves it in a "json" or "binary" file, which can be
+		loaded with stdgp.Model.loadModel. "metadata" is a dictionary stored with
+		the model.
+		'''
+		self.checkIfTrained()
+
+		feature_names = [t for t in self.terminals if not isinstance(t, EphemeralRandomConstant)]
+		info = {"generations": self.currentGeneration, "random_state": self.random_state}
+		if metadata is not None:
+			info.update(metadata)
+		model = CompiledModel.fromIndividual(self.getBestIndividual(), feature_names, info)
+		if filename is not None:
+			model.save(filename, format)
+		return model
+
+	def getFeatures(self):
+		'''
+		Returns the names of the features used by the final model.
+		'''
+		return self.exportModel().getFeatures()
+
+	def predictFile(self, filename, cache=False, cache_dir=None, validation="mtime", has_class=False):
+		'''
+		Returns the predictions for the samples of a CSV file, reading only the
+		columns of the features used by the final model (see CompiledModel.readFeatures).
+		'''
+		return self.exportModel().predictFile(filename, cache, cache_dir, validation, has_class)
+
+	def loadState(self, warm_start):
+		'''
+		Returns the state in "warm_start": a state dictionary or a file written by saveState.
+		'''
+		if isinstance(warm_start, dict):
+			return warm_start
+		with gzip.open(warm_start, "rb") as f:
+			state = pickle.load(f)
+		if state.get("version") not in [1, STATE_VERSION]:
+			raise Exception("Unsupported state version: "+str(state.get("version")))
+		return state
+
+	def createIndividual(self, seed):
+		'''
+		Returns a new Individual using a copy of "seed": an expression, a Node or an Individual.
+		'''
+		if isinstance(seed, Individual):
+			head = seed.getHead()
+		elif isinstance(seed, Node):
+			head = seed.clone()
+		else:
+			head = parseExpression(seed, self.operators, self.terminals)
+		ind = Individual(self.operators, self.terminals, self.max_depth, self.model_name, self.fitnessType, self.dtype)
+		ind.copy(head)
+		return ind
+
+
+
+	def fit(self,Tr_x, Tr_y, Te_x = None, Te_y = None, warm_start = None, seeds = None, feature_names = None):
+		'''
+		Evolves the population for max_generation generations.
+
+		The datasets can be DataFrames or SciPy sparse matrices, whose columns are
+		named by "feature_names" (by default, X0, X1, ...).
+
+		warm_start - state dictionary (see getState) or file written by saveState. The
+		             evolution continues from the saved population, random state, 
+		             generation counter and statistics, using the new data
+		seeds      - models (expressions, Nodes or Individuals) included in the initial population
+		'''
+		Tr_x = toDataset(Tr_x, feature_names)
+		Te_x = toDataset(Te_x, feature_names)
+
+		if self.islands > 1:
+			if warm_start is not None or seeds is not None:
+				print("[Warning] warm_start and seeds are not supported by the island model. Ignored.")
+			self.evolveIslands(Tr_x, Tr_y, Te_x, Te_y)
+		else:
+			self.initialize(Tr_x, Tr_y, Te_x, Te_y, warm_start, seeds)
+			self.evolve(self.max_generation)
+
+		# prun the final individual
+		self.getBestIndividual().prun()
+
+		if self.check_float64 and self.dtype != np.float64:
+			self.checkPrecision(Tr_x, Tr_y)
+
+
+	def partial_fit(self, X, Y, Te_x = None, Te_y = None, feature_names = None):
+		'''
+		Continues the evolution with a new batch of rows, running generations_per_batch
+		generations. The training set is a sliding window with the last window_size
+		rows received. The first call (if fit was not used) creates the population;
+		the test set, used for the statistics, can only be set in that call.
+
+		With a fixed threshold and a fitness without folds, the individuals that were
+		already evaluated keep their models and stored training predictions, and only
+		the new rows are evaluated. Otherwise, they are evaluated again on the window.
+		'''
+		X = toDataset(X, feature_names)
+		Te_x = toDataset(Te_x, feature_names)
+		if self.window_size is not None:
+			X = X.iloc[-self.window_size:]
+			Y = np.asarray(Y)[-self.window_size:]
+
+		if self.population is None:
+			self.initialize(X, Y, Te_x, Te_y)
+		else:
+			self.slideWindow(X, Y)
+
+		self.evolve(self.generations_per_batch)
+
+
+	def initialize(self, Tr_x, Tr_y, Te_x = None, Te_y = None, warm_start = None, seeds = None):
+		'''
+		Sets the training and test sets and creates the initial population.
+		'''
+		self.printParameters()
+		self.setData(Tr_x, Tr_y, Te_x, Te_y)
+
+		state = None if warm_start is None else self.loadState(warm_start)
+
+		self.population = []
+		self.reportedIndividual = None
+		self.sizeRejections = 0
+		self.racingTarget = None
+		self.workerTimesOverTime = []
+		self.semanticHitsOverTime = []
+		self.degenerateOverTime = []
+
+		self.currentGeneration = 0
+		if state is not None:
+			self.rng.setstate(state["rng"])
+			self.currentGeneration = state["currentGeneration"]
+			for tree in state["population"][:self.population_size]:
+				self.population.append(self.createIndividual(tree))
+
+		if seeds is not None:
+			for seed in seeds[:self.population_size - len(self.population)]:
+				self.population.append(self.createIndividual(seed))
+
+		if self.initialization == "node":
+			while len(self.population) < self.population_size:
+				ind = Individual(self.operators, self.terminals, self.max_depth, self.model_name, self.fitnessType, self.dtype)
+				ind.create(self.rng)
+				self.population.append(ind)
+		else:
+			np_rng = np.random.default_rng(self.rng.randint(0, 2**32-1))
+			encoding = PopulationEncoding(np_rng, self.population_size - len(self.population), self.operators, 
+				self.terminals, self.max_initial_depth, method=self.initialization)
+			for i in range(len(encoding)):
+				ind = Individual(self.operators, self.terminals, self.max_depth, self.model_name, self.fitnessType, self.dtype)
+				ind.createFromEncoding(encoding, i)
+				self.population.append(ind)
+
+		self.sizeLimit = max( [ind.getSize() for ind in self.population] )
+		self.bestIndividual = self.population[0]
+		if state is not None:
+			self.bestIndividual = self.createIndividual(state["bestIndividual"])
+		self.bestIndividual.getFitness(self.Tr_x, self.Tr_y, self.folds)
+
+		if not self.Te_x is None:
+			self.resetTelemetry()
+			if state is not None:
+				for name in TELEMETRY:
+					if state["telemetry"][name] is not None:
+						setattr(self, name, list(state["telemetry"][name]))
 
-	def fit(self,Tr_x, Tr_y, Te_x = None, Te_y = None):
+
+	def resetTelemetry(self):
+		for name in TELEMETRY:
+			setattr(self, name, [])
+
+	def getTelemetry(self, start=0):
+		'''
+		Returns the per-generation statistics from generation "start" onward.
+		'''
+		return dict( [(name, getattr(self, name)[start:]) for name in TELEMETRY] )
+
+
+	def printParameters(self):
 		if self.verbose:
 			print("  > Parameters")
 			print("    > Random State:       "+str(self.random_state))
@@ -192,83 +606,326 @@ class StdGP:
 			print("    > Elitism Size:       "+str(self.elitism_size))
 			print("    > Max Initial Depth:  "+str(self.max_initial_depth))
 			print("    > Max Depth:          "+str(self.max_depth))
+			print("    > Max Size:           "+str(self.max_size))
+			print("    > Bloat Control:      "+str(self.bloat_control))
 			print("    > Wrapped Model:      "+self.model_name)
 			print("    > Fitness Type:       "+self.fitnessType)
+			if self.fitnessType == "KFOLD":
+				print("    > Folds:              "+str(self.n_folds))
 			print("    > Threads:            "+str(self.threads))
+			print("    > Backend:            "+str(self.backend))
+			print("    > Prediction Storage: "+self.prediction_storage)
+			print("    > Initialization:     "+self.initialization)
+			print("    > Racing:             "+str(self.racing))
+			print("    > ERC Range:          "+str(self.erc_range))
+			print("    > Window Size:        "+str(self.window_size))
+			print("    > Gens per Batch:     "+str(self.generations_per_batch))
+			print("    > Precision:          "+np.dtype(self.dtype).name)
+			print("    > Semantic Cache:     "+str(self.semantic_cache))
+			print("    > Interval Analysis:  "+str(self.interval_analysis))
+			print("    > Islands:            "+str(self.islands))
+			if self.islands > 1:
+				print("    > Migration:          "+"%d every %d generations (%s)" % (self.migration_size, self.migration_interval, self.migration_topology))
 			print()
 
-		self.Tr_x = Tr_x
-		self.Tr_y = Tr_y
-		self.Te_x = Te_x
+
+	def setData(self, Tr_x, Tr_y, Te_x = None, Te_y = None):
+		'''
+		Sets the training and test sets and the terminals.
+		'''
+		self.Te_x = Te_x if Te_x is None else self.convertData(Te_x)
 		self.Te_y = Te_y
 		self.terminals = list(Tr_x.columns)
+		if self.erc_range is not None:
+			self.terminals.append( EphemeralRandomConstant(*self.erc_range) )
 
+		if self.racing is not None and not self.isRacingSupported():
+			print("[Warning] Racing is only supported with the Accuracy fitness, the SimpleThresholdClassifier and the serial backend. Racing disabled.")
+		if self.semantic_cache and self.backend != "serial":
+			print("[Warning] The semantic cache is only supported with the serial backend. Semantic cache disabled.")
 
-		self.population = []
+		self.setTrainingData(Tr_x, Tr_y)
 
-		while len(self.population) < self.population_size:
-			ind = Individual(self.operators, self.terminals, self.max_depth, self.model_name, self.fitnessType)
-			ind.create(self.rng)
-			self.population.append(ind)
 
-		self.bestIndividual = self.population[0]
-		self.bestIndividual.fit(self.Tr_x, self.Tr_y)
+	def setTrainingData(self, Tr_x, Tr_y):
+		'''
+		Sets the training set and the fold indices and racing order that depend on it.
+		'''
+		Tr_x = self.convertData(Tr_x)
+		self.Tr_x = Tr_x
+		self.Tr_y = Tr_y
+		self.semanticCache = OrderedDict()
+		self.featureRanges = getFeatureRanges(Tr_x, self.dtype) if self.interval_analysis else None
+
+		# Fold indices used by the cross-validated fitness types
+		self.folds = None
+		if self.fitnessType == "KFOLD":
+			self.folds = getStratifiedFolds(Tr_y, self.n_folds, np.random.default_rng(self.random_state))
+		elif self.fitnessType == "2FOLD":
+			self.folds = getContiguousFolds(len(Tr_y), 2)
+
+		self.racingOrder = None
+		if self.racing is not None and self.isRacingSupported():
+			order = np.random.default_rng(self.random_state).permutation(len(Tr_y))
+			self.racingOrder = order
+			self.racingY = np.asarray(Tr_y)[order]
+			self.racingBlocks = getRacingBlocks(len(order), self.racing_block)
+
+
+	def convertData(self, X):
+		'''
+		Returns the features with the evaluation precision.
+		'''
+		if isinstance(X, dict):
+			return dict( [(name, np.asarray(column, dtype=self.dtype)) for name, column in X.items()] )
+		if self.dtype == np.float32 and any( [t != np.float32 for t in X.dtypes] ):
+			return X.astype(np.float32)
+		return X
 
-		if not self.Te_x is None:
-			self.trainingAccuracyOverTime = []
-			self.testAccuracyOverTime = []
-			self.trainingWaFOverTime = []
-			self.testWaFOverTime = []
-			self.trainingKappaOverTime = []
-			self.testKappaOverTime = []
-			self.trainingMSEOverTime = []
-			self.testMSEOverTime = []
-			self.sizeOverTime = []
-			self.generationTimes = []
 
+	def checkPrecision(self, Tr_x, Tr_y):
+		'''
+		Computes the final model's training predictions in float64 and stores the
+		fraction of rows where they match the predictions made with the evaluation
+		precision, and the accuracy of both.
+		'''
+		ind = self.getBestIndividual()
+		pred = ind.model.predict( ind.calculate(self.convertData(Tr_x)) )
+		pred64 = ind.model.predict( ind.calculate(Tr_x.astype(np.float64), np.float64) )
+		Y = np.asarray(Tr_y)
+		self.precisionCheck = (np.mean(pred == pred64), np.mean(pred == Y), np.mean(pred64 == Y))
+
+		if self.precisionCheck[0] < 1:
+			print("[Warning] The float64 predictions of the final model differ in %.4f%% of the training rows." % (100*(1-self.precisionCheck[0])))
+
+	def getPrecisionCheck(self):
+		'''
+		Returns the fraction of training rows where the final model's predictions
+		match in float64, and the training accuracy with the evaluation precision 
+		and in float64 (see check_float64).
+		'''
+		self.checkIfTrained()
+
+		return self.precisionCheck
+
+
+	def isRacingSupported(self):
+		return self.fitnessType == "Accuracy" and self.model_name == "SimpleThresholdClassifier" and self.backend == "serial"
+
+
+	def slideWindow(self, X, Y):
+		'''
+		Appends a batch of rows to the training window, drops the oldest rows beyond
+		window_size and re-scores the population and the best individual on the new window.
+		'''
+		X = self.convertData(X)
+		n_rows = len(self.Tr_y) + len(Y)
+		start = 0 if self.window_size is None else max(0, n_rows - self.window_size)
+		if isinstance(self.Tr_x, SparseDataset):
+			Tr_x = self.Tr_x.concat(X).iloc[start:]
+		else:
+			import pandas
+			Tr_x = pandas.concat([self.Tr_x, X], ignore_index=True).iloc[start:].reset_index(drop=True)
+		Tr_y = np.concatenate([np.asarray(self.Tr_y), np.asarray(Y)])[start:]
+		self.setTrainingData(Tr_x, Tr_y)
+		Tr_x = self.Tr_x
+
+		# A fitted threshold or the folds change with the window, so the stored 
+		# predictions can only be extended when the threshold is fixed
+		incremental = THRESHOLD_FITTING.get(self.model_name) is None and self.folds is None
+
+		individuals = list(self.population)
+		if not any( [ind is self.bestIndividual for ind in individuals] ):
+			individuals.append(self.bestIndividual)
+		for ind in individuals:
+			if not (incremental and ind.slideTrainingSet(X, Y, Tr_x, Tr_y)):
+				ind.resetFitness(Tr_x, Tr_y)
+
+		self.bestIndividual.getFitness(self.Tr_x, self.Tr_y, self.folds)
+		self.reportedIndividual = None
 
 
+	def evolve(self, generations):
 		'''
-		Training loop for the algorithm.
+		Training loop for the algorithm: runs the given number of generations.
 		'''
+		self.lastGeneration = self.currentGeneration + generations
+
 		if self.verbose:
 			print("  > Running log:")
 
-		while self.currentGeneration < self.max_generation:
-			if not self.stoppingCriteria():
-				t1 = time.time()
-				self.nextGeneration()
-				t2 = time.time()
-				duration = t2-t1
-			else:
-				duration = 0
-			self.currentGeneration += 1
+		self.evaluationBackend = createBackend(self.backend, self.threads, self.prediction_storage)
+		if self.evaluationBackend is not None:
+			self.evaluationBackend.start(self.Tr_x, self.Tr_y, self.folds)
+
+		try:
+			while self.currentGeneration < self.lastGeneration:
+				if not self.stoppingCriteria():
+					t1 = time.time()
+					self.nextGeneration()
+					t2 = time.time()
+					duration = t2-t1
+				else:
+					duration = 0
+				self.currentGeneration += 1
 			
-			if not self.Te_x is None:
-				if self.fitnessType in ["Accuracy", "2FOLD", "WAF"]:
-					self.trainingAccuracyOverTime.append(self.bestIndividual.getAccuracy(self.Tr_x, self.Tr_y, pred="Tr"))
-					self.testAccuracyOverTime.append(self.bestIndividual.getAccuracy(self.Te_x, self.Te_y, pred="Te"))
-					self.trainingWaFOverTime.append(self.bestIndividual.getWaF(self.Tr_x, self.Tr_y, pred="Tr"))
-					self.testWaFOverTime.append(self.bestIndividual.getWaF(self.Te_x, self.Te_y, pred="Te"))
-					self.trainingKappaOverTime.append(self.bestIndividual.getKappa(self.Tr_x, self.Tr_y, pred="Tr"))
-					self.testKappaOverTime.append(self.bestIndividual.getKappa(self.Te_x, self.Te_y, pred="Te"))
-					self.trainingMSEOverTime.append(0)
-					self.testMSEOverTime.append(0)
-				elif self.fitnessType in ["MSE"]:
-					self.trainingAccuracyOverTime.append(0)
-					self.testAccuracyOverTime.append(0)
-					self.trainingWaFOverTime.append(0)
-					self.testWaFOverTime.append(0)
-					self.trainingKappaOverTime.append(0)
-					self.testKappaOverTime.append(0)
-					self.trainingMSEOverTime.append(self.bestIndividual.getMSE(self.Tr_x, self.Tr_y, pred="Tr"))
-					self.testMSEOverTime.append(self.bestIndividual.getMSE(self.Te_x, self.Te_y, pred="Te"))
-				self.sizeOverTime.append(self.bestIndividual.getSize())
-				self.generationTimes.append(duration)
+				if not self.Te_x is None:
+					measures = self.getReportingMeasures()
+					self.trainingAccuracyOverTime.append(measures[0])
+					self.testAccuracyOverTime.append(measures[1])
+					self.trainingWaFOverTime.append(measures[2])
+					self.testWaFOverTime.append(measures[3])
+					self.trainingKappaOverTime.append(measures[4])
+					self.testKappaOverTime.append(measures[5])
+					self.trainingMSEOverTime.append(measures[6])
+					self.testMSEOverTime.append(measures[7])
+					self.sizeOverTime.append(self.bestIndividual.getSize())
+					self.averageSizeOverTime.append(self.averageSize)
+					self.sizeRejectionsOverTime.append(self.sizeRejections)
+					self.generationTimes.append(duration)
+					self.memoryOverTime.append(self.populationMemory)
+					self.rowsSavedOverTime.append(self.rowsSaved)
+		finally:
+			if self.evaluationBackend is not None:
+				self.evaluationBackend.close()
+			clearArenas()
+
+
+
+
+	def evolveIslands(self, Tr_x, Tr_y, Te_x = None, Te_y = None):
+		'''
+		Island model: each island evolves a part of the population in its own
+		process and only the migrants, the islands' best individuals and their
+		statistics are sent between processes. In each generation, the statistics
+		of the island with the best individual are reported.
+		'''
+		self.printParameters()
+		self.setData(Tr_x, Tr_y, Te_x, Te_y)
+		if not self.Te_x is None:
+			self.resetTelemetry()
+
+		islands = []
+		try:
+			for i, size in enumerate(getIslandSizes(self.population_size, self.islands)):
+				model = copy.copy(self)
+				model.population = None
+				model.islands = 1
+				model.population_size = size
+				model.random_state = self.random_state + i
+				model.rng = Random(model.random_state)
+				model.threads = 1
+				model.backend = "serial"
+				model.verbose = False
+				islands.append( IslandProcess(model, Tr_x, Tr_y, Te_x, Te_y) )
+
+			self.currentGeneration = 0
+			self.lastGeneration = self.max_generation
+			immigrants = [[] for island in islands]
+			bestTree = None
+
+			if self.verbose:
+				print("  > Running log:")
+
+			while self.currentGeneration < self.lastGeneration:
+				generations = min(self.migration_interval, self.lastGeneration - self.currentGeneration)
+				for island, migrants in zip(islands, immigrants):
+					island.evolve(generations, migrants, self.migration_size)
+				results = [island.getResults() for island in islands]
+
+				# Migration
+				immigrants = [[] for island in islands]
+				for i, target in enumerate(getMigrationTargets(self.rng, len(islands), self.migration_topology)):
+					immigrants[target].extend(results[i][2])
+
+				# Statistics of the island with the best individual in each generation
+				for g in range(generations):
+					best = max(range(len(islands)), key=lambda i: (results[i][0][g][0], -results[i][0][g][1]))
+					if not self.Te_x is None:
+						for name in TELEMETRY:
+							getattr(self, name).append(results[best][3][name][g])
+						self.averageSizeOverTime[-1] = sum( [r[3]["averageSizeOverTime"][g] for r in results] ) / len(results)
+						self.sizeRejectionsOverTime[-1] = sum( [r[3]["sizeRejectionsOverTime"][g] for r in results] )
+						self.generationTimes[-1] = max( [r[3]["generationTimes"][g] for r in results] )
+						self.memoryOverTime[-1] = sum( [r[3]["memoryOverTime"][g] for r in results] )
+						self.rowsSavedOverTime[-1] = sum( [r[3]["rowsSavedOverTime"][g] for r in results] )
+				bestTree = results[best][1]
+				self.currentGeneration += generations
+
+				if self.verbose:
+					print("   > Gen #%2d:  Fitness: %.6f // Island: %d" % (self.currentGeneration, results[best][0][-1][0], best))
+
+			self.population = []
+			for island in islands:
+				population = island.close()
+				self.population.extend( [self.createIndividual(tree) for tree in population] )
+		finally:
+			for island in islands:
+				if island.process.is_alive():
+					island.process.terminate()
+
+		self.bestIndividual = self.createIndividual(bestTree)
+		self.bestIndividual.getFitness(self.Tr_x, self.Tr_y, self.folds)
+		self.reportedIndividual = None
+
+
+	def getEmigrants(self, n):
+		'''
+		Returns copies of the trees of the n best individuals of the current population.
+		The population is evaluated if needed; the fitness values are kept.
+		'''
+		[ ind.getFitness(self.Tr_x, self.Tr_y, self.folds) for ind in self.population ]
+		self.population.sort(reverse=True)
+		return [ind.getHead() for ind in self.population[:n]]
 
+	def addImmigrants(self, immigrants):
+		'''
+		Replaces the worst individuals of the current population by the immigrants
+		(trees). The population must have been sorted by getEmigrants.
+		'''
+		immigrants = immigrants[:len(self.population) - self.elitism_size]
+		for i, tree in enumerate(immigrants):
+			self.population[len(self.population)-1-i] = self.createIndividual(tree)
 
-		# prun the final individual
-		self.getBestIndividual().prun()
+
+
+
+	def getReportingMeasures(self):
+		'''
+		Returns the training and test accuracy, WAF, kappa and MSE of the best
+		individual. The values are reused while the best individual is unchanged.
+		'''
+		if self.reportedIndividual is self.bestIndividual:
+			return self.reportedMeasures
+
+		ind = self.bestIndividual
+		if self.fitnessType in ["Accuracy", "2FOLD", "KFOLD", "WAF"]:
+			tr_acc, tr_waf, tr_kappa = ind.getClassificationMeasures(self.Tr_x, self.Tr_y, pred="Tr")
+			te_acc, te_waf, te_kappa = ind.getClassificationMeasures(self.Te_x, self.Te_y, pred="Te")
+			measures = [tr_acc, te_acc, tr_waf, te_waf, tr_kappa, te_kappa, 0, 0]
+		elif self.fitnessType in ["MSE"]:
+			tr_mse = ind.getMSE(self.Tr_x, self.Tr_y, pred="Tr")
+			te_mse = ind.getMSE(self.Te_x, self.Te_y, pred="Te")
+			measures = [0, 0, 0, 0, 0, 0, tr_mse, te_mse]
+
+		self.reportedIndividual = ind
+		self.reportedMeasures = measures
+		return measures
+
+
+
+
+	def getSizeLimit(self):
+		'''
+		Returns the maximum number of nodes of the offspring, or None if there is no limit.
+		'''
+		limits = []
+		if self.max_size is not None:
+			limits.append(self.max_size)
+		if self.bloat_control == "dynamic":
+			self.sizeLimit = max(self.sizeLimit, int(self.dynamic_size_ratio * self.bestIndividual.getSize()))
+			limits.append(self.sizeLimit)
+		return min(limits) if limits else None
 
 
 
@@ -277,7 +934,7 @@ class StdGP:
 		'''
 		Returns True if the stopping criteria was reached.
 		'''
-		genLimit = self.currentGeneration >= self.max_generation
+		genLimit = self.currentGeneration >= self.lastGeneration
 		perfectTraining = self.bestIndividual.getFitness() == 1
 		
 		return genLimit  or perfectTraining
@@ -292,19 +949,50 @@ class StdGP:
 		'''
 		begin = time.time()
 
-		# Calculates the accuracy of the population using multiprocessing
-		if self.threads > 1:
-			with mp.Pool(processes= self.threads) as pool:
-				results = pool.map(fitIndividuals, [(ind, self.Tr_x, self.Tr_y) for ind in self.population] )
-				for i in range(len(self.population)):
-					self.population[i].trainingPredictions = results[i][0]
-					self.population[i].fitness = results[i][1]
-					self.population[i].model = results[i][2]
-					self.population[i].training_X = self.Tr_x
-					self.population[i].training_Y = self.Tr_y
+		# The dense columns of sparse datasets are only kept during a generation
+		for dataset in [self.Tr_x, self.Te_x]:
+			if isinstance(dataset, SparseDataset):
+				dataset.clearCache()
+
+		# Bloat control applied before the evaluation
+		self.sizeRejections = 0
+		if self.bloat_control == "tarpeian":
+			self.sizeRejections += tarpeian(self.rng, self.population, self.tarpeian_rate)
+		self.averageSize = sum( [ind.getSize() for ind in self.population] ) / len(self.population)
+
+		# Individuals whose outputs are known from the features' ranges
+		if self.interval_analysis:
+			self.fitDegenerate([ind for ind in self.population if ind.fitness is None])
+
+		# Calculates the accuracy of the population using the thread or process pool
+		if self.evaluationBackend is not None:
+			self.evaluationBackend.evaluate([ind for ind in self.population if ind.fitness is None])
+			self.workerTimesOverTime.append(self.evaluationBackend.workerTimes)
 		else:
-			[ ind.fit(self.Tr_x, self.Tr_y) for ind in self.population]
-			[ ind.getFitness() for ind in self.population ]
+			self.rowsSaved = 0
+			stopped = []
+			if self.racingTarget is not None:
+				for ind in self.population:
+					if ind.fitness is None:
+						ind.training_X = self.Tr_x
+						ind.training_Y = self.Tr_y
+						saved = raceIndividual(ind, self.Tr_x, self.racingY, self.racingOrder, 
+							self.racingBlocks, self.racingTarget, self.racing_delta)
+						self.rowsSaved += saved
+						if saved > 0:
+							stopped.append(ind)
+
+			if self.semantic_cache:
+				self.fitSemanticCache([ind for ind in self.population if ind.fitness is None])
+			elif THRESHOLD_FITTING.get(self.model_name) is not None and self.folds is None:
+				self.fitThresholds([ind for ind in self.population if ind.model is None and ind.fitness is None])
+
+			[ ind.getFitness(self.Tr_x, self.Tr_y, self.folds) for ind in self.population ]
+
+			# Stopped individuals rank below every individual scored on all the rows
+			if stopped:
+				stoppedIds = set( [id(ind) for ind in stopped] )
+				rankBelowEvaluated(stopped, [ind for ind in self.population if id(ind) not in stoppedIds])
 
 		# Sort the population from best to worse
 		self.population.sort(reverse=True)
@@ -314,12 +1002,38 @@ class StdGP:
 		if self.population[0] > self.bestIndividual:
 			self.bestIndividual = self.population[0]
 
+		# Fitness that the next generation's offspring must be able to reach when racing
+		if self.racing == "median" and self.racingOrder is not None:
+			self.racingTarget = self.population[len(self.population)//2].getFitness()
+
+		# Compact the training predictions that are no longer needed
+		if self.prediction_storage != "uint8":
+			for ind in self.population:
+				if ind is self.bestIndividual:
+					continue
+				if self.prediction_storage == "packed":
+					ind.packPredictions()
+				elif self.prediction_storage == "none":
+					ind.dropPredictions()
+		self.populationMemory = self.getMemoryEstimate()
+
 		# Generating Next Generation
+		sizeLimit = self.getSizeLimit()
 		newPopulation = []
 		newPopulation.extend(getElite(self.population, self.elitism_size))
+		attempts = OFFSPRING_ATTEMPTS * self.population_size
 		while len(newPopulation) < self.population_size:
+			attempts -= 1
+			if attempts < 0:
+				# The limits reject every offspring: the selected parents are kept
+				newPopulation.append( double_tournament(self.rng, self.population, self.tournament_size, self.Sf, self.Sp, self.Switch) )
+				continue
 			offspring = getOffspring(self.rng, self.population, self.tournament_size, self.Sf, self.Sp, self.Switch)
 			offspring = discardDeep(offspring, self.max_depth)
+			if sizeLimit is not None:
+				n_offspring = len(offspring)
+				offspring = discardLarge(offspring, sizeLimit)
+				self.sizeRejections += n_offspring - len(offspring)
 			newPopulation.extend(offspring)
 		self.population = newPopulation[:self.population_size]
 
@@ -336,35 +1050,135 @@ class StdGP:
 
 
 
-	def predict(self, dataset):
+	def fitThresholds(self, individuals):
+		'''
+		Fits the thresholds of the individuals' models in batches, sorting the
+		outputs of all the individuals in each batch with the same numpy calls.
+		'''
+		fitting = THRESHOLD_FITTING[self.model_name]
+		Y = np.asarray(self.Tr_y)
+		batch_size = max(1, THRESHOLD_BATCH_SIZE // max(1, len(Y)))
+
+		for start in range(0, len(individuals), batch_size):
+			batch = individuals[start:start+batch_size]
+			S = np.stack( [ind.calculate(self.Tr_x) for ind in batch] )
+			thresholds = getOptimalThresholds(S, Y, fitting)
+
+			for ind, semantics, threshold in zip(batch, S, thresholds):
+				ind.training_X = self.Tr_x
+				ind.training_Y = self.Tr_y
+				ind.model = ind.createModel()
+				ind.model.threshold = threshold
+				ind.trainingPredictions = ind.model.predict(semantics)
+
+
+
+	def fitDegenerate(self, individuals):
+		'''
+		Scores, without evaluating them on the training set, the individuals whose
+		outputs are the same for every sample or, with a fixed threshold, are all
+		on the same side of the threshold (0). Their outputs are replaced by a constant
+		with the same predictions, so the fitness is the same as when evaluated.
+		'''
+		fixed = THRESHOLD_FITTING.get(self.model_name) is None
+		degenerate = 0
+		for ind in individuals:
+			bounds = getOutputInterval(ind.getProgram(), self.featureRanges, self.dtype)
+			if bounds is None:
+				continue
+			low, high = bounds
+			if low == high or (fixed and low > 0):
+				value = low
+			elif fixed and high <= 0:
+				value = high
+			else:
+				continue
+
+			semantics = np.full(len(self.Tr_y), value, dtype=self.dtype)
+			ind.fitSemantics(semantics, self.Tr_x, self.Tr_y)
+			ind.getFitness(self.Tr_x, self.Tr_y, self.folds, semantics)
+			degenerate += 1
+
+		self.degenerateOverTime.append(degenerate)
+
+	def getDegenerateOverTime(self):
 		'''
-		Returns the predictions for the samples in a dataset.
+		Returns the number of individuals scored by the interval analysis, without
+		being evaluated, in each generation.
 		'''
 		self.checkIfTrained()
 
-		return self.population.getBestIndividual().predict(dataset)
+		return self.degenerateOverTime
+
+	def getSemanticKey(self, semantics):
+		'''
+		Returns the hash of an individual's outputs on the training set.
+		'''
+		if self.semantic_decimals is not None:
+			semantics = np.round(semantics, self.semantic_decimals) + 0.0 # -0.0 == 0.0
+		return hashlib.blake2b(np.ascontiguousarray(semantics).tobytes(), digest_size=16).digest()
 
-		return "Population Not Trained" if self.bestIndividual == None else self.bestIndividual.predict(sample)
+	def fitSemanticCache(self, individuals):
+		'''
+		Scores the individuals, reusing the fitness, threshold and training
+		predictions of the individuals with the same outputs found in the
+		semantic cache. The outputs are only computed once.
+		'''
+		lookups = self.semanticLookups
+		hits = self.semanticHits
+		for ind in individuals:
+			semantics = ind.calculate(self.Tr_x)
+			key = self.getSemanticKey(semantics)
+			self.semanticLookups += 1
+
+			if key in self.semanticCache:
+				self.semanticCache.move_to_end(key)
+				fitness, threshold, packed = self.semanticCache[key]
+				setEvaluationResult(ind, fitness, ind.getSize(), threshold, packed, 
+					self.Tr_x, self.Tr_y, self.prediction_storage)
+				self.semanticHits += 1
+				continue
+
+			ind.fitSemantics(semantics, self.Tr_x, self.Tr_y)
+			fitness = ind.getFitness(self.Tr_x, self.Tr_y, self.folds, semantics)
+			self.semanticCache[key] = (fitness, ind.model.threshold, np.packbits(ind.getTrainingPredictions()))
+			if len(self.semanticCache) > self.semantic_cache:
+				self.semanticCache.popitem(last=False)
+
+		self.semanticHitsOverTime.append( (self.semanticLookups - lookups, self.semanticHits - hits) )
+
+	def getSemanticCacheStats(self):
+		'''
+		Returns the number of individuals looked up in the semantic cache, the number
+		of them that reused a cached result, and the number of cached results.
+		'''
+		self.checkIfTrained()
 
+		return self.semanticLookups, self.semanticHits, len(self.semanticCache)
 
+	def getSemanticHitsOverTime(self):
+		'''
+		Returns the number of lookups and hits in the semantic cache in each generation.
+		'''
+		self.checkIfTrained()
 
+		return self.semanticHitsOverTime
 
 
-def fitIndividuals(a):
-	ind,x,y = a
-	ind.getFitness(x,y)
+	def predict(self, dataset, feature_names = None):
+		'''
+		Returns the predictions for the samples in a dataset (a DataFrame, a
+		dictionary from feature names to NumPy arrays, or a SciPy sparse matrix
+		whose columns are named by "feature_names", by default the training set's
+		features).
+		'''
+		self.checkIfTrained()
 
-	ret = []
-	if "FOLD" in ind.fitnessType:
-		ret.append(None)
-	else:
-		ret.append(ind.getTrainingPredictions())
-	
-	ret.append(ind.getFitness())
-	ret.append(ind.model)
+		if feature_names is None:
+			feature_names = [t for t in self.terminals if not isinstance(t, EphemeralRandomConstant)]
+		dataset = toDataset(dataset, feature_names)
 
-	
-	return ret 
+		return self.getBestIndividual().predict(self.convertData(dataset))
 
 
 
@@ -0,0 +1,54 @@
+import subprocess
+import sys
+import os
+
+#
+# By using this file, you are agreeing to this product's EULA
+#
+# This product can be obtained in https://github.com/jespb/Python-StdGP
+#
+# Copyright ©2019-2022 J. E. Batista
+#
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Generous bound, in seconds, on the import time of stdgp without NumPy (measured at
+# about 0.06s, and about 1.3s when pandas and scikit-learn are imported too)
+IMPORT_TIME_LIMIT = 1.0
+
+
+def test_import_without_pandas_or_sklearn():
+	'''
+	Importing the estimator and the compiled models must not import pandas or
+	scikit-learn (see "Dependencies" in README.txt).
+	'''
+	code = "import stdgp.StdGP, stdgp.Model, sys; assert not {'pandas','sklearn'} & set(sys.modules), sorted({'pandas','sklearn'} & set(sys.modules))"
+	result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+	assert result.returncode == 0, result.stderr
+
+
+def test_import_time():
+	'''
+	Importing the estimator and the compiled models, excluding NumPy, takes
+	less than IMPORT_TIME_LIMIT seconds, measured with "python -X importtime".
+	'''
+	result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import stdgp.StdGP, stdgp.Model"],
+		cwd=ROOT, capture_output=True, text=True)
+	assert result.returncode == 0, result.stderr
+
+	total = 0
+	numpy = 0
+	for line in result.stderr.splitlines():
+		if not line.startswith("import time:") or "cumulative" in line:
+			continue
+		self_us, cumulative_us, name = line[len("import time:"):].split("|")
+		if not name[1:].startswith(" "):
+			total += int(cumulative_us) # modules imported by the command
+		if name.strip() == "numpy":
+			numpy = int(cumulative_us)
+	assert (total - numpy) / 1e6 < IMPORT_TIME_LIMIT, result.stderr
+
+
+if __name__ == "__main__":
+	test_import_without_pandas_or_sklearn()
+	test_import_time()
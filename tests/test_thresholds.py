@@ -0,0 +1,66 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from stdgp.SimpleThresholdClassifier import SimpleThresholdClassifier, getOptimalThresholds
+
+#
+# By using this file, you are agreeing to this product's EULA
+#
+# This product can be obtained in https://github.com/jespb/Python-StdGP
+#
+# Copyright ©2019-2022 J. E. Batista
+#
+
+
+def getScore(predictions, Y, fitting):
+	tp = np.sum( (predictions == 1) & (Y == 1) )
+	if fitting == "F1":
+		return 2*tp / max(1, np.sum(predictions == 1) + np.sum(Y == 1))
+	return np.sum(predictions == Y)
+
+
+def getBestScore(values, Y, fitting):
+	'''
+	Returns the best score of the rule "1 if v > threshold else 0" over every
+	threshold, by brute force. NaN outputs are always class 0.
+	'''
+	finite = np.unique(values[~np.isnan(values)])
+	candidates = [-np.inf] + list(finite)
+	return max( [getScore( ((values > t) & ~np.isnan(values)).astype(np.uint8), Y, fitting) for t in candidates] )
+
+
+def test_thresholds_with_nan_outputs():
+	'''
+	The learned thresholds reach the best score when some outputs are NaN, and
+	the NaN outputs are predicted as class 0.
+	'''
+	rng = np.random.default_rng(0)
+	for trial in range(300):
+		n = int(rng.integers(1, 12))
+		Y = rng.integers(0, 2, n)
+		values = rng.integers(-3, 3, n).astype(np.float64)
+		values[rng.random(n) < 0.4] = np.nan
+		if trial % 10 == 0:
+			values[:] = np.nan
+		for fitting in ["Accuracy", "F1"]:
+			model = SimpleThresholdClassifier(fitting=fitting)
+			model.fit(values, Y)
+			predictions = model.predict(values)
+			assert np.all(predictions[np.isnan(values)] == 0)
+			assert getScore(predictions, Y, fitting) == getBestScore(values, Y, fitting), (values, Y, fitting)
+
+
+def test_batch_thresholds_match_single_model():
+	'''
+	A batch of models gets the same thresholds as each model on its own.
+	'''
+	rng = np.random.default_rng(1)
+	Y = rng.integers(0, 2, 50)
+	S = rng.normal(size=(8, 50))
+	S[S > 1] = np.nan
+	thresholds = getOptimalThresholds(S, Y)
+	for values, threshold in zip(S, thresholds):
+		assert threshold == getOptimalThresholds(values, Y)[0]